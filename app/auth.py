@@ -1,16 +1,36 @@
 # app/auth.py
 import uuid
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from .db import get_db
+from .models import uuid7
 
-def get_current_user_id(db: Session = Depends(get_db)) -> uuid.UUID:
-    row = db.execute(text("SELECT id FROM users ORDER BY created_at LIMIT 1")).first()
-    if row:
-        return row[0]
-    new_id = uuid.uuid4()
-    # only id is required; created_at defaults to now()
-    db.execute(text("INSERT INTO users (id) VALUES (:id)"), {"id": str(new_id)})
+def get_current_user_id(request: Request, db: Session = Depends(get_db)) -> uuid.UUID:
+    # The single default user never changes, so cache it on app.state and
+    # skip the DB on warm requests. Signup endpoints must reset it to None.
+    cached = getattr(request.app.state, "default_user_id", None)
+    if cached is not None:
+        return cached
+
+    # Single round-trip: reuse the first user if one exists, otherwise insert
+    # one in the same statement (only id is required; created_at defaults to now())
+    row = db.execute(
+        text("""
+            WITH existing AS (
+                SELECT id FROM users ORDER BY created_at LIMIT 1
+            ), ins AS (
+                INSERT INTO users (id)
+                SELECT :id WHERE NOT EXISTS (SELECT 1 FROM existing)
+                RETURNING id
+            )
+            SELECT id FROM existing
+            UNION ALL
+            SELECT id FROM ins
+            LIMIT 1
+        """),
+        {"id": str(uuid7())},
+    ).first()
     db.commit()
-    return new_id
+    request.app.state.default_user_id = row[0]
+    return row[0]
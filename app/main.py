@@ -1,6 +1,9 @@
 ﻿# app/main.py
 from fastapi import FastAPI
 from .routers.tracks import router as tracks_router
+from .routers.spot import router as spot_router
 
 app = FastAPI(title="Bikepacking Tracker API")
+app.state.default_user_id = None  # filled by auth.get_current_user_id on first use
 app.include_router(tracks_router)
+app.include_router(spot_router)
@@ -1,13 +1,25 @@
 ﻿from __future__ import annotations
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
-from sqlalchemy import String, DateTime, Float, ForeignKey, Enum, JSON, Index, UniqueConstraint, BigInteger
-from sqlalchemy.dialects.postgresql import UUID
-from geoalchemy2 import Geometry
+from sqlalchemy import String, DateTime, Float, ForeignKey, ForeignKeyConstraint, Enum, Index, UniqueConstraint, BigInteger, Computed, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from geoalchemy2 import Geography, Geometry
 from datetime import datetime
-import uuid, enum
+import uuid, enum, os, time
 
 Base = declarative_base()
 
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 v7): 48-bit unix-ms prefix, random tail.
+
+    uuid4 keys scatter btree inserts across random pages; the time prefix
+    keeps inserts appending at the right edge like a bigserial, while the
+    column type stays plain UUID.
+    """
+    ts_ms = (time.time_ns() // 1_000_000) & 0xFFFFFFFFFFFF
+    rand_a = int.from_bytes(os.urandom(2), "big") & 0x0FFF
+    rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+    return uuid.UUID(int=(ts_ms << 80) | (0x7 << 76) | (rand_a << 64) | (0b10 << 62) | rand_b)
+
 class DeviceType(enum.Enum):
     spot = "spot"
     inreach = "inreach"
@@ -21,7 +33,7 @@ class RouteSource(enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     email: Mapped[str | None] = mapped_column(String(320), unique=True)
     name: Mapped[str | None] = mapped_column(String(200))
     home_geom = mapped_column(Geometry(geometry_type="POINT", srid=4326), nullable=True)
@@ -29,10 +41,12 @@ class User(Base):
 
 class Device(Base):
     __tablename__ = "devices"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True)
     type: Mapped[DeviceType] = mapped_column(Enum(DeviceType, name="device_type"))
-    external_id: Mapped[str] = mapped_column(String(128), index=True)
+    # no standalone index: lookups always filter by type first, which the
+    # uq_device_provider_extid composite below serves
+    external_id: Mapped[str] = mapped_column(String(128))
     secret: Mapped[str | None] = mapped_column(String(256))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
     user = relationship("User", backref="devices")
@@ -40,7 +54,7 @@ class Device(Base):
 
 class Route(Base):
     __tablename__ = "routes"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True)
     name: Mapped[str] = mapped_column(String(200))
     source: Mapped[RouteSource] = mapped_column(Enum(RouteSource, name="route_source"))
@@ -57,7 +71,7 @@ class Route(Base):
 
 class Track(Base):
     __tablename__= "tracks"
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), index=True)
     route_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("routes.id", ondelete="SET NULL"))
     device_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="SET NULL"))
@@ -65,29 +79,82 @@ class Track(Base):
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     ended_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     total_distance_m: Mapped[float | None] = mapped_column(Float)
+    # bounds captured at upload so GET /tracks/{id} skips ST_Extent
+    min_lat: Mapped[float | None] = mapped_column(Float)
+    max_lat: Mapped[float | None] = mapped_column(Float)
+    min_lon: Mapped[float | None] = mapped_column(Float)
+    max_lon: Mapped[float | None] = mapped_column(Float)
+    # materialized at upload so /line doesn't re-aggregate track_points
+    geom_line = mapped_column(Geometry(geometry_type="LINESTRINGZ", srid=4326), nullable=True)
+    geom_line_simplified_100 = mapped_column(Geometry(geometry_type="LINESTRINGZ", srid=4326), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
 class TrackPoint(Base):
     __tablename__ = "track_points"
+    # partitioned monthly by ts, so the partition key joins the PK
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
-    track_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tracks.id", ondelete="CASCADE"), index=True)
-    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    # no standalone track_id index: the composite below covers the prefix
+    track_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tracks.id", ondelete="CASCADE"))
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
     elev_m: Mapped[float | None] = mapped_column(Float)
     geom = mapped_column(Geometry(geometry_type="POINTZ", srid=4326))
+    # materialized at insert so export/analytics scans read plain doubles
+    # instead of reparsing EWKB with ST_X/ST_Y per row
+    lon: Mapped[float | None] = mapped_column(Float, Computed("ST_X(geom)", persisted=True))
+    lat: Mapped[float | None] = mapped_column(Float, Computed("ST_Y(geom)", persisted=True))
     __table_args__ = (
-        Index("ix_track_points_geom", "geom", postgresql_using="gist"),
-        Index("ix_track_points_track_ts","track_id","ts"),
+        # SP-GiST: smaller and faster than GiST for pure point data
+        Index("ix_track_points_geom", "geom", postgresql_using="spgist"),
+        # covering: "render a track" (SELECT geom, elev_m ... ORDER BY ts)
+        # becomes an index-only scan instead of N random heap fetches
+        Index("ix_track_points_track_ts", "track_id", text("ts DESC"),
+              postgresql_include=["geom", "elev_m"]),
+        # BRIN suits the append-only, ts-ordered ingest: tiny index, cheap
+        # inserts, fast time-range scans. Per-track ordering uses the
+        # composite btree above.
+        Index("ix_track_points_ts_brin", "ts", postgresql_using="brin",
+              postgresql_with={"pages_per_range": 32}),
+        {"postgresql_partition_by": "RANGE (ts)"},
     )
 
 class LivePosition(Base):
     __tablename__ = "live_positions"
+    # partitioned monthly by ts, same PK shape as track_points
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
-    device_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), index=True)
-    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
-    geom = mapped_column(Geometry(geometry_type="POINTZ", srid=4326))
+    device_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"))
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    # geography, not geometry: ST_DWithin/ST_Distance return spheroid meters
+    # directly for "nearby devices" queries (GiST — no SP-GiST for geography)
+    geom = mapped_column(Geography(geometry_type="POINTZ", srid=4326))
+    lon: Mapped[float | None] = mapped_column(Float, Computed("ST_X(geom::geometry)", persisted=True))
+    lat: Mapped[float | None] = mapped_column(Float, Computed("ST_Y(geom::geometry)", persisted=True))
     battery: Mapped[float | None] = mapped_column(Float)
-    extra = mapped_column(JSON, nullable=True)
     __table_args__ = (
         Index("ix_live_positions_geom","geom", postgresql_using="gist"),
-        UniqueConstraint("device_id","ts", name="uq_live_device_ts"),
+        Index("ix_live_positions_ts_brin", "ts", postgresql_using="brin",
+              postgresql_with={"pages_per_range": 32}),
+        # dedupe + "latest fix per device" index-only scan in one index;
+        # its (device_id) prefix also stands in for a standalone FK index
+        Index("uq_live_device_ts", "device_id", text("ts DESC"), unique=True,
+              postgresql_include=["geom", "battery"]),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+class LivePositionExtra(Base):
+    __tablename__ = "live_positions_extra"
+    # rarely-read provider payloads live beside live_positions, not in it,
+    # so hot time-range scans pack more fixes per heap page. A row exists
+    # only when the provider sent extras. Keyed (position_id, ts) because
+    # the parent's PK carries the partition key.
+    position_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    extra = mapped_column(JSONB, nullable=False)
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["position_id", "ts"],
+            ["live_positions.id", "live_positions.ts"],
+            ondelete="CASCADE",
+        ),
+        Index("ix_live_positions_extra_gin", "extra", postgresql_using="gin",
+              postgresql_ops={"extra": "jsonb_path_ops"}),
     )
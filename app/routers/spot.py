@@ -1,17 +1,24 @@
 # app/routers/spot.py
+import csv
+import io
+import json
 import logging
 import uuid
+from collections import namedtuple
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Tuple
 
+import anyio.to_thread
 import httpx
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, Query
+from lxml import etree as LET
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from xml.etree import ElementTree as ET
 
 from ..db import get_db
 from ..auth import get_current_user_id
+from ..models import uuid7
 
 router = APIRouter(prefix="/spot", tags=["spot"])
 log = logging.getLogger(__name__)
@@ -19,102 +26,134 @@ log = logging.getLogger(__name__)
 
 # ---------- DB helpers (introspect & geometry info) ----------
 
+# Introspection queries cost a round-trip each, but the schema only changes
+# at migration time. Cache results per (helper, key) for the process lifetime
+# so repeated imports skip information_schema entirely after the first call.
+_SCHEMA_CACHE: Dict[Tuple[str, str], object] = {}
+
+
+def _schema_cached(kind: str, key: str, loader):
+    cache_key = (kind, key)
+    if cache_key not in _SCHEMA_CACHE:
+        _SCHEMA_CACHE[cache_key] = loader()
+    return _SCHEMA_CACHE[cache_key]
+
+
+def clear_schema_cache() -> None:
+    """Drop cached introspection results (call after running migrations)."""
+    _SCHEMA_CACHE.clear()
+
+
 def get_columns(db: Session, table: str) -> List[str]:
-    rows = db.execute(
-        text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = :t
-        """),
-        {"t": table},
-    ).fetchall()
-    return [r[0] for r in rows]
+    def load():
+        rows = db.execute(
+            text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
+            """),
+            {"t": table},
+        ).fetchall()
+        return [r[0] for r in rows]
+    return _schema_cached("columns", table, load)
 
 def get_enum_labels(db: Session, type_name: str) -> List[str]:
     """Return labels for a Postgres enum type."""
-    rows = db.execute(
-        text("""
-            SELECT e.enumlabel
-            FROM pg_type t
-            JOIN pg_enum e ON e.enumtypid = t.oid
-            WHERE t.typname = :t
-            ORDER BY e.enumsortorder
-        """),
-        {"t": type_name},
-    ).fetchall()
-    return [r[0] for r in rows]
+    def load():
+        rows = db.execute(
+            text("""
+                SELECT e.enumlabel
+                FROM pg_type t
+                JOIN pg_enum e ON e.enumtypid = t.oid
+                WHERE t.typname = :t
+                ORDER BY e.enumsortorder
+            """),
+            {"t": type_name},
+        ).fetchall()
+        return [r[0] for r in rows]
+    return _schema_cached("enum_labels", type_name, load)
 
 
 def get_column_types(db: Session, table: str) -> Dict[str, Tuple[str, str]]:
-    rows = db.execute(
-        text("""
-            SELECT column_name, data_type, udt_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = :t
-        """),
-        {"t": table},
-    ).fetchall()
-    return {r[0]: (r[1], r[2]) for r in rows}
-
-
-def get_geom_info(db: Session, table: str, geom_col: str = "geom") -> Tuple[int, int]:
-    """
-    Returns (coord_dimension, srid) for public.<table>.<geom_col>.
-    Defaults to (2, 4326) if not found.
-    """
-    try:
-        r = db.execute(
+    def load():
+        rows = db.execute(
             text("""
-                SELECT coord_dimension, srid
-                FROM geometry_columns
-                WHERE f_table_schema='public'
-                  AND f_table_name=:t
-                  AND f_geometry_column=:c
-                LIMIT 1
+                SELECT column_name, data_type, udt_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
             """),
-            {"t": table, "c": geom_col},
-        ).first()
-        if r:
-            dim = int(r[0] or 2)
-            srid = int(r[1] or 4326)
-            return dim, srid
-    except Exception:
-        pass
-    return 2, 4326
+            {"t": table},
+        ).fetchall()
+        return {r[0]: (r[1], r[2]) for r in rows}
+    return _schema_cached("column_types", table, load)
 
 
 # ---------- SPOT feed fetching & parsing ----------
 
 def _parse_dt(unix: Optional[str], date_str: Optional[str]) -> datetime:
-    # Prefer unixTime if present; else try dateTime like "2024-07-01T12:34:56+0000"
+    # Prefer unixTime if present; else dateTime like "2024-07-01T12:34:56+0000"
     if unix:
         try:
             return datetime.fromtimestamp(int(unix), tz=timezone.utc)
-        except Exception:
+        except (TypeError, ValueError):
             pass
     if date_str:
-        for fmt in ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z"):
-            try:
-                return datetime.strptime(date_str, fmt)
-            except Exception:
-                continue
-        # last resort: try to normalize "+00:00" vs "+0000"
+        # Normalize compact offsets ("+0000" -> "+00:00") so one fromisoformat
+        # call covers both SPOT variants instead of a strptime trial chain that
+        # raises and unwinds an exception per mismatched format.
+        if len(date_str) >= 5 and date_str[-5] in "+-" and date_str[-3] != ":":
+            date_str = date_str[:-2] + ":" + date_str[-2:]
         try:
-            if date_str.endswith("+00:00"):
-                return datetime.fromisoformat(date_str)
-        except Exception:
+            dt = datetime.fromisoformat(date_str)
+            # offset-less payloads parse naive; treat them as UTC so every ts
+            # is aware (a naive one would break max() over the batch and be
+            # read in server time on insert)
+            return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+        except ValueError:
             pass
     # fallback to now
     return datetime.now(timezone.utc)
 
 
 def _safe_float(x) -> Optional[float]:
-    try:
-        if x is None or x == "":
-            return None
-        return float(x)
-    except Exception:
+    # Branch-only on the common cases (None / empty string / number); the
+    # try/except is reserved for genuinely malformed strings so the hot path
+    # never pays exception-unwinding cost.
+    if x is None:
         return None
+    if isinstance(x, (int, float)):
+        return float(x)
+    if isinstance(x, str):
+        s = x.strip()
+        if not s:
+            return None
+        try:
+            return float(s)
+        except ValueError:
+            return None
+    return None
+
+
+# Alternate spellings seen across SPOT payload variants. A feed uses the same
+# key set for every message, so we resolve the variant once (from the first
+# message) instead of probing every alias per message.
+_KeyPlan = namedtuple("_KeyPlan", "lat lon alt battery msg_type esn mid date")
+
+_LAT_KEYS = ("latitude", "lat")
+_LON_KEYS = ("longitude", "lng", "lon")
+_ALT_KEYS = ("altitude", "alt")
+_BATTERY_KEYS = ("batteryState", "battery")
+_TYPE_KEYS = ("messageType", "type")
+_ESN_KEYS = ("esn", "messengerId")
+_ID_KEYS = ("id", "messageId")
+_DATE_KEYS = ("dateTime", "time")
+
+
+def _pick_key(m: dict, candidates: Tuple[str, ...]) -> str:
+    for k in candidates:
+        if k in m:
+            return k
+    return candidates[0]
 
 
 def parse_spot_json(payload: dict) -> List[dict]:
@@ -135,18 +174,35 @@ def parse_spot_json(payload: dict) -> List[dict]:
     if isinstance(items, dict):
         items = [items]
 
+    plan: Optional[_KeyPlan] = None
     out = []
     for m in items:
-        lat = _safe_float(m.get("latitude") or m.get("lat"))
-        lon = _safe_float(m.get("longitude") or m.get("lng") or m.get("lon"))
-        z = _safe_float(m.get("altitude") or m.get("alt"))
+        if plan is None:
+            plan = _KeyPlan(
+                lat=_pick_key(m, _LAT_KEYS),
+                lon=_pick_key(m, _LON_KEYS),
+                alt=_pick_key(m, _ALT_KEYS),
+                battery=_pick_key(m, _BATTERY_KEYS),
+                msg_type=_pick_key(m, _TYPE_KEYS),
+                esn=_pick_key(m, _ESN_KEYS),
+                mid=_pick_key(m, _ID_KEYS),
+                date=_pick_key(m, _DATE_KEYS),
+            )
+
+        lat = _safe_float(m.get(plan.lat))
+        lon = _safe_float(m.get(plan.lon))
+        if lat is None or lon is None:
+            # atypical message — retry coords with the full alias chain
+            lat = _safe_float(m.get("latitude") or m.get("lat"))
+            lon = _safe_float(m.get("longitude") or m.get("lng") or m.get("lon"))
+        z = _safe_float(m.get(plan.alt))
         speed = _safe_float(m.get("speed"))
         # 'batteryState' can be "GOOD", etc.
-        battery = (m.get("batteryState") or m.get("battery") or "").strip() or None
-        msg_type = (m.get("messageType") or m.get("type") or "").strip() or None
-        esn = (m.get("esn") or m.get("messengerId") or "").strip() or None
-        mid = str(m.get("id") or m.get("messageId") or "").strip() or None
-        ts = _parse_dt(m.get("unixTime"), m.get("dateTime") or m.get("time"))
+        battery = (m.get(plan.battery) or "").strip() or None
+        msg_type = (m.get(plan.msg_type) or "").strip() or None
+        esn = (m.get(plan.esn) or "").strip() or None
+        mid = str(m.get(plan.mid) or "").strip() or None
+        ts = _parse_dt(m.get("unixTime"), m.get(plan.date))
 
         if lat is None or lon is None:
             continue
@@ -163,15 +219,15 @@ def parse_spot_xml(xml_bytes: bytes) -> List[dict]:
     """
     Parses SPOT XML like:
       <response><feedMessageResponse><messages><message>...</message></messages></feedMessageResponse></response>
+
+    Streams <message> elements via lxml.iterparse (regardless of nesting) and
+    frees them as it goes, instead of materializing the whole DOM up front.
     """
-    root = ET.fromstring(xml_bytes)
-    # find all <message> nodes regardless of nesting
-    msgs = root.findall(".//message")
     out = []
-    for m in msgs:
+    for _, m in LET.iterparse(io.BytesIO(xml_bytes), tag="message"):
         def g(tag):  # first child text by tag
-            el = m.find(tag)
-            return el.text.strip() if el is not None and el.text is not None else None
+            val = m.findtext(tag)
+            return val.strip() if val is not None else None
 
         lat = _safe_float(g("latitude") or g("lat"))
         lon = _safe_float(g("longitude") or g("lng") or g("lon"))
@@ -183,6 +239,11 @@ def parse_spot_xml(xml_bytes: bytes) -> List[dict]:
         mid = (g("id") or g("messageId") or "").strip() or None
         ts = _parse_dt(g("unixTime"), g("dateTime") or g("time"))
 
+        # release the element (and already-consumed siblings) before moving on
+        m.clear()
+        while m.getprevious() is not None:
+            del m.getparent()[0]
+
         if lat is None or lon is None:
             continue
         out.append({
@@ -193,52 +254,171 @@ def parse_spot_xml(xml_bytes: bytes) -> List[dict]:
     return out
 
 
+# Shared HTTP client: keep-alive connections (and their TLS sessions) are
+# reused across imports instead of handshaking once per request.
+_HTTPX: Optional[httpx.AsyncClient] = None
+
+
+def _http_client() -> httpx.AsyncClient:
+    global _HTTPX
+    if _HTTPX is None or _HTTPX.is_closed:
+        _HTTPX = httpx.AsyncClient(
+            timeout=20,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _HTTPX
+
+
+@router.on_event("shutdown")
+async def _close_http_client() -> None:
+    global _HTTPX
+    if _HTTPX is not None and not _HTTPX.is_closed:
+        await _HTTPX.aclose()
+    _HTTPX = None
+
+
+# Remember which representation a feed actually serves, so repeat imports of
+# XML-only feeds (common when password-protected) skip the failed JSON attempt.
+_FEED_FORMAT: Dict[str, str] = {}
+
+
 async def fetch_spot_messages(feed_id: str, feed_password: Optional[str] = None) -> List[dict]:
     """
-    Tries JSON first, then XML. Returns normalized list as per parsers above.
+    Tries JSON first, then XML, caching the working format per feed.
+    Returns normalized list as per parsers above.
     """
     base = f"https://api.findmespot.com/spot-main-web/consumer/rest-api/2.0/public/feed/{feed_id}/message"
     params = {}
     if feed_password:
         params["feedPassword"] = feed_password
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        # Try JSON
+    client = _http_client()
+
+    # Try JSON unless we already know this feed only speaks XML
+    if _FEED_FORMAT.get(feed_id) != "xml":
         try:
             rj = await client.get(base + ".json", params=params)
             if rj.status_code == 200 and rj.headers.get("content-type", "").lower().find("json") >= 0:
                 data = rj.json()
                 items = parse_spot_json(data)
                 if items:
+                    _FEED_FORMAT[feed_id] = "json"
                     return items
         except Exception as e:
             log.warning("SPOT JSON fetch failed: %s", e)
 
-        # Fallback to XML
-        rx = await client.get(base + ".xml", params=params)
-        rx.raise_for_status()
-        return parse_spot_xml(rx.content)
-
-
-# ---------- Inserts into live_positions (schema-aware) ----------
-
-def _select_existing_msg_ids(db: Session, provider: str, msg_ids: List[str]) -> set:
-    if not msg_ids:
-        return set()
-    cols = set(get_columns(db, "live_positions"))
-    if "provider_msg_id" not in cols or "provider" not in cols:
-        return set()
-    # fetch existing ids for this provider
-    # NOTE: for small batches (<200), IN list is fine.
-    rows = db.execute(
-        text("""
-            SELECT provider_msg_id
-            FROM live_positions
-            WHERE provider = :p AND provider_msg_id IN :ids
-        """),
-        {"p": provider, "ids": tuple([mid for mid in msg_ids if mid])},
-    ).fetchall()
-    return {r[0] for r in rows}
+    # Fallback to XML
+    rx = await client.get(base + ".xml", params=params)
+    rx.raise_for_status()
+    items = parse_spot_xml(rx.content)
+    if items:
+        _FEED_FORMAT[feed_id] = "xml"
+    return items
+
+
+# ---------- Inserts into live_positions ----------
+
+# The live_positions schema is fixed by app.models.LivePosition, so the insert
+# path binds straight to those columns — (device_id, ts, geom geography
+# POINTZ/4326, battery) — instead of re-introspecting information_schema
+# per import. Provider extras ride in the live_positions_extra sibling.
+_LP_SRID = 4326
+
+# Above this many rows, server-side statement parsing dominates even batched
+# INSERTs; stream the batch with COPY instead.
+_COPY_MIN_ROWS = 1000
+
+_LP_CONFLICT_SQL = " ON CONFLICT (device_id, ts) DO NOTHING"
+
+_INSERT_POSITIONS_SQL = text(
+    "INSERT INTO live_positions (device_id, ts, battery, geom) "
+    "SELECT t.device_id, t.ts, t.battery, "
+    f"ST_SetSRID(ST_MakePoint(t.lon, t.lat, t.z), {_LP_SRID})::geography "
+    "FROM unnest("
+    "CAST(:device_id AS uuid[]), CAST(:ts AS timestamptz[]), "
+    "CAST(:battery AS float8[]), "
+    "CAST(:lon AS float8[]), CAST(:lat AS float8[]), CAST(:z AS float8[])"
+    ") AS t(device_id, ts, battery, lon, lat, z)"
+    + _LP_CONFLICT_SQL
+)
+
+# Provider extras go to the sibling table — live_positions stays narrow for
+# hot time-range scans, and a row exists only when there is a payload. The
+# join resolves the generated position id via the (device_id, ts) unique
+# index; conflicting rows were imported (with their extras) on a prior run.
+_INSERT_EXTRAS_SQL = text(
+    "INSERT INTO live_positions_extra (position_id, ts, extra) "
+    "SELECT lp.id, lp.ts, t.extra "
+    "FROM unnest("
+    "CAST(:device_id AS uuid[]), CAST(:ts AS timestamptz[]), "
+    "CAST(:extra AS jsonb[])"
+    ") AS t(device_id, ts, extra) "
+    "JOIN live_positions lp ON lp.device_id = t.device_id AND lp.ts = t.ts "
+    "WHERE t.extra IS NOT NULL "
+    "ON CONFLICT (position_id, ts) DO NOTHING"
+)
+
+
+def _copy_positions(db: Session, rows: List[Dict[str, object]]) -> int:
+    """
+    COPY-based fast path for large batches: stream CSV into a temp staging
+    table (geometries as EWKT text), then insert-select into live_positions
+    so the ON CONFLICT dedupe still applies.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        z = r["z"] if r["z"] is not None else 0.0
+        ewkt = f"SRID={_LP_SRID};POINT Z ({r['lon']} {r['lat']} {z})"
+        writer.writerow([
+            r["device_id"],
+            r["ts"],
+            "" if r["battery"] is None else r["battery"],
+            ewkt,
+            "" if r["extra"] is None else r["extra"],
+        ])
+    buf.seek(0)
+
+    named = "device_id, ts, battery, geom"
+    raw_conn = db.connection().connection
+    cur = raw_conn.cursor()
+    try:
+        # Explicit stage columns, not LIKE live_positions: LIKE would copy
+        # the identity column's NOT NULL without its default (COPY omitting
+        # id would then fail on the first row), and the stage carries extra
+        # even though live_positions doesn't — one COPY stream feeds both the
+        # positions insert and the extras sibling.
+        cur.execute(
+            "CREATE TEMP TABLE _live_positions_stage ("
+            "device_id uuid, ts timestamptz, battery float8, "
+            "geom geography(PointZ, 4326), extra jsonb"
+            ") ON COMMIT DROP"
+        )
+        copy_sql = (
+            f"COPY _live_positions_stage ({named}, extra) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        if hasattr(cur, "copy_expert"):  # psycopg2
+            cur.copy_expert(copy_sql, buf)
+        else:  # psycopg 3
+            with cur.copy(copy_sql) as cp:
+                cp.write(buf.read())
+        cur.execute(
+            f"INSERT INTO live_positions ({named}) "
+            f"SELECT {named} FROM _live_positions_stage{_LP_CONFLICT_SQL}"
+        )
+        inserted = cur.rowcount
+        cur.execute(
+            "INSERT INTO live_positions_extra (position_id, ts, extra) "
+            "SELECT lp.id, lp.ts, s.extra "
+            "FROM _live_positions_stage s "
+            "JOIN live_positions lp ON lp.device_id = s.device_id AND lp.ts = s.ts "
+            "WHERE s.extra IS NOT NULL "
+            "ON CONFLICT (position_id, ts) DO NOTHING"
+        )
+    finally:
+        cur.close()
+    return inserted if inserted is not None and inserted >= 0 else len(rows)
 
 
 def insert_positions(
@@ -246,199 +426,100 @@ def insert_positions(
     user_id: uuid.UUID,
     msgs: List[dict],
 ) -> int:
-    lp_cols = set(get_columns(db, "live_positions"))
-    lp_types = get_column_types(db, "live_positions")
-    lp_constraints = get_column_constraints(db, "live_positions")
-
-    has_geom = "geom" in lp_cols
-    needs_ts = "ts" in lp_cols
-    has_speed_kph = "speed_kph" in lp_cols
-    has_speed_mps = "speed_mps" in lp_cols
-    has_battery = "battery" in lp_cols
-    has_user = "user_id" in lp_cols
-    has_device = "device_id" in lp_cols
-    has_raw = "raw" in lp_cols  # jsonb
-
-    # Is device_id required (NOT NULL without a default)?
-    device_required = (
-        has_device
-        and lp_constraints.get("device_id", {}).get("is_nullable") == "NO"
-        and not lp_constraints.get("device_id", {}).get("column_default")
-    )
-
-    # Prepare PostGIS geometry builder, if needed
-    if has_geom:
-        dim, srid = get_geom_info(db, "live_positions", "geom")
-        point_sql = (
-            "ST_SetSRID(ST_MakePoint(:lon, :lat, COALESCE(:z, 0.0)), {srid})".format(srid=srid)
-            if dim >= 3 else
-            "ST_SetSRID(ST_MakePoint(:lon, :lat), {srid})".format(srid=srid)
-        )
+    # Resolve all ESNs in one batched query instead of one SELECT per message
+    esn_to_dev: Dict[str, str] = {}
+    esns = sorted({m["esn"] for m in msgs if m.get("esn")})
+    if esns:
+        dev_rows = db.execute(
+            text("""
+                SELECT external_id, id FROM devices
+                WHERE type = 'spot' AND user_id = :uid AND external_id = ANY(:exts)
+            """),
+            {"uid": str(user_id), "exts": esns},
+        ).fetchall()
+        esn_to_dev = {r[0]: str(r[1]) for r in dev_rows}
 
-    # If device is required, choose/create a default device for this user once
+    # device_id is NOT NULL; messages that don't resolve land on a per-user
+    # default device, created lazily on first need
     default_device_id: Optional[str] = None
-    if device_required:
-        first_esn = next((m.get("esn") for m in msgs if m.get("esn")), None)
-        default_device_id = ensure_spot_device_for_user(db, user_id, first_esn)
 
-    # Normalize messages -> rows (dicts for executemany)
     rows: List[Dict[str, object]] = []
     for m in msgs:
-        row: Dict[str, object] = {}
-        if needs_ts:
-            row["ts"] = m["ts"]
-
-        if has_user:
-            row["user_id"] = str(user_id)
+        if m.get("lat") is None or m.get("lon") is None:
+            continue
 
-        if has_geom:
-            row["lat"] = m["lat"]
-            row["lon"] = m["lon"]
-            row["z"] = m.get("z")
-        else:
-            # classic lat/lon schema variants
-            if "lat" in lp_cols:
-                row["lat"] = m["lat"]
-            if "lon" in lp_cols:
-                row["lon"] = m["lon"]
-            if "lng" in lp_cols:
-                row["lng"] = m["lon"]
-            if "ele" in lp_cols:
-                row["ele"] = m.get("z")
-
-        # speed
-        if has_speed_kph and m.get("speed_kph") is not None:
-            row["speed_kph"] = m["speed_kph"]
-        elif has_speed_mps and m.get("speed_kph") is not None:
-            row["speed_mps"] = m["speed_kph"] / 3.6
-
-        # battery: numeric vs text, depending on column type
-        if has_battery:
-            batt_raw = m.get("battery")
-            battery_dt, battery_udt = lp_types.get("battery", ("", ""))
-            battery_is_numeric = (
-                battery_dt in {"double precision", "real", "numeric"} or
-                battery_udt in {"float8", "float4", "numeric"}
-            )
-            if battery_is_numeric:
-                val = None
-                if batt_raw is not None:
-                    try:
-                        val = float(str(batt_raw).strip())
-                    except Exception:
-                        val = None
-                row["battery"] = val
-            else:
-                row["battery"] = batt_raw
-
-        # device: try to resolve per message if schema supports provider/external_id
-        if has_device:
-            dev_id = None
-            dev_cols = set(get_columns(db, "devices"))
-            if {"provider", "external_id", "id"}.issubset(dev_cols) and m.get("esn"):
-                dev = db.execute(
-                    text("""
-                        SELECT id FROM devices
-                        WHERE provider = :p AND external_id = :ext
-                          AND (:uid::uuid IS NULL OR user_id = :uid)
-                        LIMIT 1
-                    """),
-                    {"p": "spot", "ext": m["esn"], "uid": str(user_id)},
-                ).first()
-                if dev:
-                    dev_id = str(dev[0])
-
-            # If NOT NULL is enforced, fall back to the default for any rows that didn't resolve
-            if device_required:
-                dev_id = dev_id or default_device_id
-
-            if dev_id is not None:
-                row["device_id"] = dev_id
-
-        if has_raw:
-            row["raw"] = {"msg_type": m.get("msg_type"), "esn": m.get("esn")}
-
-        rows.append(row)
+        dev_id = esn_to_dev.get(m["esn"]) if m.get("esn") else None
+        if dev_id is None:
+            if default_device_id is None:
+                first_esn = next((x.get("esn") for x in msgs if x.get("esn")), None)
+                default_device_id = ensure_spot_device_for_user(db, user_id, first_esn)
+            dev_id = default_device_id
+
+        # anything without a dedicated column rides along in extra
+        extra = {k: m[k] for k in ("msg_type", "esn", "message_id", "speed_kph") if m.get(k)}
+        rows.append({
+            "device_id": dev_id,
+            "ts": m["ts"],
+            "battery": _safe_float(m.get("battery")),  # textual states ("GOOD") -> NULL
+            "extra": json.dumps(extra) if extra else None,
+            "lat": m["lat"],
+            "lon": m["lon"],
+            "z": m.get("z"),
+        })
 
     if not rows:
         return 0
 
-    # Decide which optional columns to include in INSERT
-    include_device = has_device and all(r.get("device_id") is not None for r in rows)
-    if device_required and not include_device:
-        # Safety net: schema requires device_id but we couldn't produce one
-        raise HTTPException(
-            status_code=500,
-            detail="live_positions.device_id is NOT NULL but no device_id could be resolved. "
-                   "Create a SPOT device for this user or relax the NOT NULL constraint."
-        )
-
-    if has_geom:
-        cols = []
-        if has_user: cols.append("user_id")
-        if needs_ts: cols.append("ts")
-        if include_device: cols.append("device_id")
-        if has_battery: cols.append("battery")
-        if has_speed_kph: cols.append("speed_kph")
-        if has_speed_mps: cols.append("speed_mps")
-        cols.append("geom")  # always last; uses ST_MakePoint()
-
-        # Ensure every row has all keys (fill None), and required coords exist
-        for r in rows:
-            for c in cols:
-                if c != "geom":
-                    r.setdefault(c, None)
-            if "lat" not in r or "lon" not in r or r["lat"] is None or r["lon"] is None:
-                r["__skip__"] = True
-        rows = [r for r in rows if "__skip__" not in r]
-        if not rows:
-            return 0
-
-        named = ", ".join(cols)
-        parts = []
-        for c in cols:
-            parts.append(point_sql if c == "geom" else f":{c}")
-        values = "(" + ", ".join(parts) + ")"
-        sql = f"INSERT INTO live_positions ({named}) VALUES {values}"
-
+    # Very large batches skip INSERT entirely and stream via COPY
+    if len(rows) > _COPY_MIN_ROWS:
         try:
-            db.execute(text(sql), rows)
+            inserted = _copy_positions(db, rows)
         except Exception as e:
             db.rollback()
-            log.exception("Insert into live_positions (geom) failed")
+            log.exception("COPY into live_positions failed")
             raise HTTPException(status_code=500, detail=f"Insert live_positions failed: {e}")
+        db.commit()
+        return inserted
+
+    # Single statement, single round-trip: bind parallel arrays and let
+    # Postgres expand them via unnest(), building the geometries server-side.
+    # Coordinate columns go through one contiguous NumPy pass; tolist() hands
+    # psycopg plain Python floats at bind time.
+    n = len(rows)
+    params: Dict[str, object] = {
+        "device_id": [r["device_id"] for r in rows],
+        "ts": [r["ts"] for r in rows],
+        "battery": [r["battery"] for r in rows],
+        "lon": np.fromiter((r["lon"] for r in rows), dtype="f8", count=n).tolist(),
+        "lat": np.fromiter((r["lat"] for r in rows), dtype="f8", count=n).tolist(),
+        "z": np.fromiter(
+            (r["z"] if r["z"] is not None else 0.0 for r in rows),
+            dtype="f8", count=n,
+        ).tolist(),
+    }
 
-    else:
-        # classic (lat/lon) schema; try common templates
-        template_opts = [
-            ["user_id", "ts", "lat", "lon"],
-            ["user_id", "ts", "lat", "lng"],
-            ["ts", "lat", "lon"],
-            ["ts", "lat", "lng"],
-        ]
-        template = next((tpl for tpl in template_opts if set(tpl).issubset(lp_cols)), None)
-        if not template:
-            raise HTTPException(status_code=500, detail=f"live_positions schema unsupported. Columns: {sorted(lp_cols)}")
-
-        for r in rows:
-            for c in template:
-                r.setdefault(c, None)
-
-        placeholders = ", ".join(template)
-        binds = ", ".join([f":{c}" for c in template])
-        sql = f"INSERT INTO live_positions ({placeholders}) VALUES ({binds})"
-
-        try:
-            db.execute(text(sql), rows)
-        except Exception as e:
-            db.rollback()
-            log.exception("Insert into live_positions (classic) failed")
-            raise HTTPException(status_code=500, detail=f"Insert live_positions failed: {e}")
+    extras = [r["extra"] for r in rows]
+    try:
+        result = db.execute(_INSERT_POSITIONS_SQL, params)
+        if any(x is not None for x in extras):
+            db.execute(_INSERT_EXTRAS_SQL, {
+                "device_id": params["device_id"],
+                "ts": params["ts"],
+                "extra": extras,
+            })
+    except Exception as e:
+        db.rollback()
+        log.exception("Insert into live_positions failed")
+        raise HTTPException(status_code=500, detail=f"Insert live_positions failed: {e}")
 
     db.commit()
+    # rowcount excludes conflicting (already-imported) rows
+    if result.rowcount is not None and result.rowcount >= 0:
+        return result.rowcount
     return len(rows)
 
 
+
 # ---------- API endpoints ----------
 
 @router.post("/import")
@@ -461,23 +542,79 @@ async def import_spot_feed(
     if not msgs:
         return {"imported": 0, "reason": "no messages"}
 
-    inserted = insert_positions(db, user_id, msgs)
+    # insert_positions is synchronous psycopg work; run it on a worker thread
+    # so the event loop keeps serving other requests during the insert
+    inserted = await anyio.to_thread.run_sync(insert_positions, db, user_id, msgs)
     newest = max(m["ts"] for m in msgs) if msgs else None
     return {
         "imported": inserted,
         "messages_seen": len(msgs),
         "newest_ts": newest,
     }
-def get_column_constraints(db: Session, table: str) -> Dict[str, Dict[str, Optional[str]]]:
+
+
+@router.get("/near")
+def nearest_positions(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user_id=Depends(get_current_user_id),
+):
+    """
+    Returns the k live positions nearest to (lat, lon).
+
+    Uses the KNN `<->` operator so the spatial index drives an ordered walk
+    instead of sorting the whole table by ST_Distance. geom is geography, so
+    `<->` and ST_Distance are spheroid meters straight off the GiST index.
+    """
+    cols = set(get_columns(db, "live_positions"))
+    if "geom" not in cols:
+        raise HTTPException(status_code=500, detail="live_positions has no geom column; KNN unavailable")
+
+    point = "ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography"
+    # generated lon/lat columns skip the per-row geom decode when present
+    if {"lat", "lon"}.issubset(cols):
+        coord_sel = "lat, lon"
+    else:
+        coord_sel = "ST_Y(geom::geometry) AS lat, ST_X(geom::geometry) AS lon"
+    select_cols = ["id", "ts"]
+    if "device_id" in cols:
+        select_cols.append("device_id")
+    if "battery" in cols:
+        select_cols.append("battery")
+
+    params = {"lon": lon, "lat": lat, "k": k}
+    where = ""
+    if "user_id" in cols:
+        where = "WHERE user_id = CAST(:uid AS uuid)"
+        params["uid"] = str(user_id)
+
     rows = db.execute(
-        text("""
-            SELECT column_name, is_nullable, column_default
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = :t
+        text(f"""
+            SELECT {", ".join(select_cols)},
+                   {coord_sel},
+                   ST_Distance(geom, {point}) AS distance_m
+            FROM live_positions
+            {where}
+            ORDER BY geom <-> {point}
+            LIMIT :k
         """),
-        {"t": table},
-    ).fetchall()
-    return {r[0]: {"is_nullable": r[1], "column_default": r[2]} for r in rows}
+        params,
+    ).mappings().all()
+    return {"count": len(rows), "items": [dict(r) for r in rows]}
+def get_column_constraints(db: Session, table: str) -> Dict[str, Dict[str, Optional[str]]]:
+    def load():
+        rows = db.execute(
+            text("""
+                SELECT column_name, is_nullable, column_default
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
+            """),
+            {"t": table},
+        ).fetchall()
+        return {r[0]: {"is_nullable": r[1], "column_default": r[2]} for r in rows}
+    return _schema_cached("column_constraints", table, load)
 
 
 def ensure_spot_device_for_user(db: Session, user_id: uuid.UUID, esn: Optional[str]) -> str:
@@ -556,7 +693,7 @@ def ensure_spot_device_for_user(db: Session, user_id: uuid.UUID, esn: Optional[s
             return str(row[0])
 
     # ----- Create device, providing all NOT NULL columns -----
-    dev_id = str(uuid.uuid4())
+    dev_id = str(uuid7())
     cols, vals, bind = ["id"], [":id"], {"id": dev_id}
 
     def add(col: str, value):
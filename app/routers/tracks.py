@@ -1,23 +1,49 @@
 # app/routers/tracks.py
+import csv
+import enum
+import io
+import os
 import uuid
 import logging
+import tempfile
 from datetime import timezone, datetime, timedelta
+from math import radians, sin, cos, asin, sqrt
 from typing import Optional, Dict, List, Tuple
 
+import anyio.to_thread
 import gpxpy
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import numpy as np
+from fastapi import APIRouter, Request, UploadFile, File, HTTPException, Depends
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from ..db import get_db
 from ..auth import get_current_user_id
+from ..models import uuid7
+
+# numba is optional: when installed, the haversine accumulator runs as a
+# fused compiled loop (no intermediate arrays); otherwise NumPy handles it.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# pandas is optional too: its to_datetime converts and UTC-localizes a whole
+# timestamp column in one C pass instead of per-object tz arithmetic.
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
 
 router = APIRouter(prefix="/tracks", tags=["tracks"])
 log = logging.getLogger(__name__)
 
+# Upload ceiling: reject pathological bodies before burning CPU/memory on
+# a parse that will fail or be discarded anyway.
+MAX_GPX_BYTES = int(os.getenv("MAX_GPX_BYTES", str(50 * 1024 * 1024)))
+
 
 def haversine_m(lat1, lon1, lat2, lon2) -> float:
-    from math import radians, sin, cos, asin, sqrt
     R = 6371000.0
     phi1, phi2 = radians(lat1), radians(lat2)
     dphi = phi2 - phi1
@@ -26,6 +52,57 @@ def haversine_m(lat1, lon1, lat2, lon2) -> float:
     return 2 * R * asin(sqrt(a))
 
 
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _haversine_total(lat, lon):  # pragma: no cover - compiled
+        acc = 0.0
+        for i in range(1, lat.shape[0]):
+            phi1 = np.radians(lat[i - 1])
+            phi2 = np.radians(lat[i])
+            dphi = phi2 - phi1
+            dlam = np.radians(lon[i] - lon[i - 1])
+            a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+            acc += 2 * 6371000.0 * np.arcsin(np.sqrt(a))
+        return acc
+
+    # compile at import so the first upload doesn't pay the JIT cost
+    _haversine_total(np.zeros(2), np.zeros(2))
+else:
+    def _haversine_total(lat, lon):
+        phi = np.radians(lat)
+        dphi = np.diff(phi)
+        dlam = np.diff(np.radians(lon))
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(dlam / 2) ** 2
+        return float((2 * 6371000.0 * np.arcsin(np.sqrt(a))).sum())
+
+
+def _coord_arrays(pts) -> Tuple[np.ndarray, np.ndarray]:
+    """Dense (lat, lon) float64 arrays for pts; coordinate-less points dropped."""
+    n = len(pts)
+    lat = np.fromiter(
+        (p.latitude if p.latitude is not None else np.nan for p in pts),
+        dtype=np.float64, count=n,
+    )
+    lon = np.fromiter(
+        (p.longitude if p.longitude is not None else np.nan for p in pts),
+        dtype=np.float64, count=n,
+    )
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    return np.ascontiguousarray(lat[ok]), np.ascontiguousarray(lon[ok])
+
+
+def total_distance_m(pts) -> float:
+    """
+    Haversine length of a GPX point sequence in meters, accumulated over
+    contiguous float64 arrays instead of a per-segment Python loop (numba
+    JIT when available, NumPy otherwise).
+    """
+    lat, lon = _coord_arrays(pts)
+    if lat.size < 2:
+        return 0.0
+    return float(_haversine_total(lat, lon))
+
+
 def to_utc(dt):
     if dt is None:
         return None
@@ -33,16 +110,36 @@ def to_utc(dt):
     return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
 
 
+# Same caching scheme as app.routers.spot: information_schema only changes
+# at migration time, so pay the introspection round-trips once per process.
+_SCHEMA_CACHE: Dict[Tuple[str, str], object] = {}
+
+
+def _schema_cached(kind: str, key: str, loader):
+    cache_key = (kind, key)
+    if cache_key not in _SCHEMA_CACHE:
+        _SCHEMA_CACHE[cache_key] = loader()
+    return _SCHEMA_CACHE[cache_key]
+
+
+def clear_schema_cache() -> None:
+    """Drop cached introspection results (call after running migrations)."""
+    _SCHEMA_CACHE.clear()
+    _GEOM_INFO_CACHE.clear()
+
+
 def get_columns(db: Session, table: str) -> List[str]:
-    rows = db.execute(
-        text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = :t
-        """),
-        {"t": table},
-    ).fetchall()
-    return [r[0] for r in rows]
+    def load():
+        rows = db.execute(
+            text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
+            """),
+            {"t": table},
+        ).fetchall()
+        return [r[0] for r in rows]
+    return _schema_cached("columns", table, load)
 
 
 def get_column_types(db: Session, table: str) -> Dict[str, Tuple[str, str]]:
@@ -50,91 +147,253 @@ def get_column_types(db: Session, table: str) -> Dict[str, Tuple[str, str]]:
     Returns {column_name: (data_type, udt_name)}, e.g.
       {"id": ("bigint", "int8")} or {"id": ("uuid","uuid")}
     """
-    rows = db.execute(
-        text("""
-            SELECT column_name, data_type, udt_name
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = :t
-        """),
-        {"t": table},
-    ).fetchall()
-    return {r[0]: (r[1], r[2]) for r in rows}
+    def load():
+        rows = db.execute(
+            text("""
+                SELECT column_name, data_type, udt_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
+            """),
+            {"t": table},
+        ).fetchall()
+        return {r[0]: (r[1], r[2]) for r in rows}
+    return _schema_cached("column_types", table, load)
 
 
-def get_geom_info(db: Session) -> Tuple[int, int]:
+def get_column_constraints(db: Session, table: str) -> Dict[str, Dict[str, Optional[str]]]:
     """
-    Returns (coord_dimension, srid) for public.track_points.geom.
-    Defaults to (2, 4326) if not found.
+    Returns {column_name: {"is_nullable": "YES"/"NO", "column_default": str|None}}.
     """
-    try:
-        r = db.execute(
+    def load():
+        rows = db.execute(
             text("""
-                SELECT coord_dimension, srid
-                FROM geometry_columns
-                WHERE f_table_schema='public'
-                  AND f_table_name='track_points'
-                  AND f_geometry_column='geom'
-                LIMIT 1
-            """)
-        ).first()
-        if r:
-            dim = int(r[0] or 2)
-            srid = int(r[1] or 4326)
-            return dim, srid
-    except Exception:
-        pass
-    return 2, 4326
+                SELECT column_name, is_nullable, column_default
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = :t
+            """),
+            {"t": table},
+        ).fetchall()
+        return {r[0]: {"is_nullable": r[1], "column_default": r[2]} for r in rows}
+    return _schema_cached("column_constraints", table, load)
 
 
-def build_insert_sql(table: str, data: Dict[str, object]) -> (str, Dict[str, object]):
-    cols = list(data.keys())
-    placeholders = [f":{c}" for c in cols]
-    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(placeholders)})"
-    return sql, data
+class TrackPointsSchema(enum.Enum):
+    POSTGIS_WITH_ELEV = "postgis_with_elev"
+    POSTGIS_NO_ELEV = "postgis_no_elev"
+    CLASSIC_LAT_LON = "classic_lat_lon"
+    CLASSIC_LAT_LNG = "classic_lat_lng"
+    UNKNOWN = "unknown"
 
 
-@router.post("/upload")
-def upload_gpx(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    user_id=Depends(get_current_user_id),
-):
-    # ensure multipart is available
-    try:
-        import multipart  # noqa: F401
-    except Exception:
-        raise HTTPException(status_code=500, detail="python-multipart not installed. Run: pip install python-multipart")
+def detect_track_points_schema(db: Session) -> TrackPointsSchema:
+    """
+    Classify the track_points layout once per process. Endpoints branch on
+    this enum instead of rebuilding column sets and subset checks per
+    request; clear_schema_cache() resets it after migrations.
+    """
+    def load():
+        cols = set(get_columns(db, "track_points"))
+        if {"track_id", "geom", "ts"}.issubset(cols):
+            if "elev_m" in cols:
+                return TrackPointsSchema.POSTGIS_WITH_ELEV
+            return TrackPointsSchema.POSTGIS_NO_ELEV
+        if {"lat", "lon", "t"}.issubset(cols):
+            return TrackPointsSchema.CLASSIC_LAT_LON
+        if {"lat", "lng", "t"}.issubset(cols):
+            return TrackPointsSchema.CLASSIC_LAT_LNG
+        return TrackPointsSchema.UNKNOWN
+    return _schema_cached("track_points_schema", "classified", load)
 
-    if not file.filename.lower().endswith(".gpx"):
-        raise HTTPException(status_code=400, detail="Only .gpx files are supported right now.")
 
-    raw = file.file.read()
+# geometry_columns never changes outside migrations; cache per process so
+# uploads skip the round-trip after the first call
+_GEOM_INFO_CACHE: Dict[str, Tuple[int, int]] = {}
+
+
+def get_geom_info(db: Session) -> Tuple[int, int]:
+    """
+    Returns (coord_dimension, srid) for public.track_points.geom, cached.
+    Defaults to (2, 4326) if the column isn't registered; a missing
+    geometry_columns view (no PostGIS) is a real error and raises.
+    """
+    cached = _GEOM_INFO_CACHE.get("track_points.geom")
+    if cached is not None:
+        return cached
+    r = db.execute(
+        text("""
+            SELECT coord_dimension, srid
+            FROM geometry_columns
+            WHERE f_table_schema='public'
+              AND f_table_name='track_points'
+              AND f_geometry_column='geom'
+            LIMIT 1
+        """)
+    ).first()
+    info = (int(r[0] or 2), int(r[1] or 4326)) if r else (2, 4326)
+    _GEOM_INFO_CACHE["track_points.geom"] = info
+    return info
+
+
+# All points go in as one statement bound to parallel arrays, same as the
+# live_positions path in app.routers.spot: unnest() turns the arrays back
+# into rows server-side, so Postgres parses and plans a single INSERT no
+# matter how many points the file has. Only a handful of
+# (has_elev, include_id, dim>=3, srid) shapes exist; memoize the compiled
+# TextClause per shape.
+_UNNEST_SQL: Dict[Tuple[bool, bool, bool, int], object] = {}
+
+
+def _unnest_insert_sql(has_elev: bool, include_id: bool, d3: bool, srid: int):
+    key = (has_elev, include_id, d3, srid)
+    sql = _UNNEST_SQL.get(key)
+    if sql is not None:
+        return sql
+
+    cols = ["track_id", "ts"]
+    select = ["CAST(:tid AS uuid)", "u.t"]
+    arrays = ["CAST(:ts AS timestamptz[])"]
+    alias = ["t"]
+    if include_id:
+        cols.insert(0, "id")
+        select.insert(0, "u.id")
+        arrays.insert(0, "CAST(:ids AS uuid[])")
+        alias.insert(0, "id")
+    if has_elev:
+        cols.append("elev_m")
+        select.append("u.e")
+        arrays.append("CAST(:elev AS float8[])")
+        alias.append("e")
+    cols.append("geom")
+    arrays += ["CAST(:lon AS float8[])", "CAST(:lat AS float8[])"]
+    alias += ["x", "y"]
+    if d3:
+        arrays.append("CAST(:z AS float8[])")
+        alias.append("z")
+        select.append(f"ST_SetSRID(ST_MakePoint(u.x, u.y, COALESCE(u.z, 0.0)), {srid})")
+    else:
+        select.append(f"ST_SetSRID(ST_MakePoint(u.x, u.y), {srid})")
+
+    sql = text(
+        f"INSERT INTO track_points ({', '.join(cols)}) "
+        f"SELECT {', '.join(select)} "
+        f"FROM unnest({', '.join(arrays)}) AS u({', '.join(alias)})"
+    )
+    _UNNEST_SQL[key] = sql
+    return sql
+
+
+# Above this many points, even the single unnest statement carries a large
+# bind payload; COPY streams rows without per-statement parse/bind at all.
+_COPY_MIN_POINTS = 50_000
+
+
+def _copy_track_points(db, has_elev, include_id, d3, srid,
+                       track_id, ids, tss, elevs, lons, lats, zs) -> None:
+    """
+    Bulk-load points with COPY ... FROM STDIN (CSV), same as the large-batch
+    path for live_positions in app.routers.spot. Geometries travel as EWKT,
+    which PostGIS parses straight into the geometry column; an empty CSV
+    field reads back as NULL.
+    """
+    cols = ["track_id", "ts"]
+    if include_id:
+        cols.insert(0, "id")
+    if has_elev:
+        cols.append("elev_m")
+    cols.append("geom")
+
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    tid = str(track_id)
+    for i in range(len(tss)):
+        ts = tss[i]
+        row = [tid, ts if isinstance(ts, str) else ts.isoformat()]
+        if include_id:
+            row.insert(0, ids[i])
+        if has_elev:
+            row.append("" if elevs[i] is None else elevs[i])
+        if d3:
+            z = zs[i] if zs[i] is not None else 0.0
+            row.append(f"SRID={srid};POINT Z ({lons[i]} {lats[i]} {z})")
+        else:
+            row.append(f"SRID={srid};POINT ({lons[i]} {lats[i]})")
+        w.writerow(row)
+    buf.seek(0)
+
+    copy_sql = f"COPY track_points ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)"
+    cur = db.connection().connection.cursor()
     try:
-        gpx = gpxpy.parse(raw.decode("utf-8", errors="ignore"))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid GPX: {e}")
+        if hasattr(cur, "copy_expert"):  # psycopg2
+            cur.copy_expert(copy_sql, buf)
+        else:  # psycopg 3
+            with cur.copy(copy_sql) as cp:
+                cp.write(buf.read())
+    finally:
+        cur.close()
 
-    # Flatten points
+
+def _parse_gpx_sync(fileobj) -> Tuple[list, float, Optional[Dict[str, float]]]:
+    """
+    Parse a GPX stream, flatten its points, and compute distance plus bounds.
+    Runs in a worker thread: gpxpy.parse and the array passes are pure CPU
+    and would otherwise block the event loop. Parsing straight from the file
+    object (lxml-backed when available) avoids a bytes copy plus a decoded
+    str copy; bounds come from the same arrays the distance pass uses.
+    """
+    gpx = gpxpy.parse(io.TextIOWrapper(fileobj, encoding="utf-8", errors="ignore"))
     pts = []
     for trk in gpx.tracks:
         for seg in trk.segments:
             pts.extend(seg.points)
-
     if not pts:
-        raise HTTPException(status_code=400, detail="GPX contains no points.")
+        return pts, 0.0, None
+    lat, lon = _coord_arrays(pts)
+    dist = float(_haversine_total(lat, lon)) if lat.size >= 2 else 0.0
+    bounds = None
+    if lat.size:
+        bounds = {
+            "min_lat": float(lat.min()), "max_lat": float(lat.max()),
+            "min_lon": float(lon.min()), "max_lon": float(lon.max()),
+        }
+    return pts, dist, bounds
+
+
+def build_insert_sql(table: str, data: Dict[str, object]) -> (str, Dict[str, object]):
+    cols = list(data.keys())
+    placeholders = [f":{c}" for c in cols]
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(placeholders)})"
+    return sql, data
 
-    # Distance (only across points with coords)
-    total_dist_m = 0.0
-    for a, b in zip(pts[:-1], pts[1:]):
-        if (a.latitude is not None and a.longitude is not None
-                and b.latitude is not None and b.longitude is not None):
-            total_dist_m += haversine_m(a.latitude, a.longitude, b.latitude, b.longitude)
-
-    # Time window + base timestamp
-    times = [p.time for p in pts if p.time]
-    if times:
-        started_at: Optional[datetime] = to_utc(min(times))
-        ended_at:   Optional[datetime] = to_utc(max(times))
+
+def _store_track_sync(
+    db: Session,
+    user_id,
+    filename: str,
+    pts: list,
+    total_dist_m: float,
+    gpx_bounds: Optional[Dict[str, float]],
+):
+    """
+    DB phase of an upload, run on a worker thread: the batch assembly and
+    the unnest/COPY insert of up to tens of thousands of points are
+    blocking work that would otherwise stall the event loop for every
+    concurrent request.
+    """
+    # Time window + base timestamp, in one pass (no intermediate times list,
+    # no separate min()/max() scans)
+    t_min: Optional[datetime] = None
+    t_max: Optional[datetime] = None
+    for p in pts:
+        t = p.time
+        if t is None:
+            continue
+        if t_min is None or t < t_min:
+            t_min = t
+        if t_max is None or t > t_max:
+            t_max = t
+    if t_min is not None:
+        started_at: Optional[datetime] = to_utc(t_min)
+        ended_at:   Optional[datetime] = to_utc(t_max)
         base_ts = started_at
     else:
         # No times in GPX → synthesize a reasonable window and point timestamps
@@ -147,16 +406,18 @@ def upload_gpx(
     tpoints_cols = set(get_columns(db, "track_points"))
     tpoints_types = get_column_types(db, "track_points")
 
-    track_id = uuid.uuid4()
+    track_id = uuid7()
     proposed = {
         "id": str(track_id),
         "user_id": str(user_id),
-        "name": file.filename.rsplit(".", 1)[0],
+        "name": filename.rsplit(".", 1)[0],
         "started_at": started_at,
         "ended_at": ended_at,
         "total_distance_m": int(total_dist_m),
         "num_points": len(pts),
     }
+    if gpx_bounds:
+        proposed.update(gpx_bounds)  # columns exist post-migration; filtered below otherwise
     track_row = {k: v for k, v in proposed.items() if k in tracks_cols}
     if "id" not in track_row and "id" in tracks_cols:
         track_row["id"] = str(track_id)
@@ -173,76 +434,132 @@ def upload_gpx(
 
     # --- Insert into track_points ---
     inserted_points = 0
+    schema = detect_track_points_schema(db)
 
     # Branch A: PostGIS schema (geom + ts [+ elev_m] [+ id])
-    if {"track_id", "geom", "ts"}.issubset(tpoints_cols):
-        has_elev = "elev_m" in tpoints_cols
+    if schema in (TrackPointsSchema.POSTGIS_WITH_ELEV, TrackPointsSchema.POSTGIS_NO_ELEV):
+        has_elev = schema is TrackPointsSchema.POSTGIS_WITH_ELEV
 
-        # Include "id" only if it's a uuid column; skip if bigint/serial/identity
+        # Include "id" only for uuid columns the server can't fill itself:
+        # with a gen_random_uuid()/uuid_generate/nextval default, omitting
+        # the column skips N client-side RNG calls and shrinks the binds.
         include_id = False
         if "id" in tpoints_cols:
             dt, udt = tpoints_types.get("id", ("", ""))
-            include_id = (dt == "uuid") or (udt == "uuid")
+            if (dt == "uuid") or (udt == "uuid"):
+                id_default = (
+                    get_column_constraints(db, "track_points").get("id") or {}
+                ).get("column_default") or ""
+                include_id = not any(
+                    fn in id_default
+                    for fn in ("gen_random_uuid", "uuid_generate", "nextval")
+                )
 
         # Geometry dimension & SRID
         geom_dim, srid = get_geom_info(db)
-        makepoint_sql = (
-            f"ST_SetSRID(ST_MakePoint(:lon, :lat, COALESCE(:z, 0.0)), {srid})"
-            if geom_dim >= 3
-            else f"ST_SetSRID(ST_MakePoint(:lon, :lat), {srid})"
-        )
-
-        cols = ["track_id", "ts", "geom"]
-        if has_elev:
-            cols.insert(2, "elev_m")
-        if include_id:
-            cols.insert(0, "id")
-        named = ", ".join(cols)
-
-        if include_id and has_elev:
-            values = f"(:id, :track_id, :ts, :elev_m, {makepoint_sql})"
-        elif include_id and not has_elev:
-            values = f"(:id, :track_id, :ts, {makepoint_sql})"
-        elif not include_id and has_elev:
-            values = f"(:track_id, :ts, :elev_m, {makepoint_sql})"
-        else:
-            values = f"(:track_id, :ts, {makepoint_sql})"
-
-        sql = f"INSERT INTO track_points ({named}) VALUES {values}"
-
-        rows = []
+        d3 = geom_dim >= 3
+
+        # No timestamps anywhere in the file: synthesize the whole 1 Hz ramp
+        # as a datetime64 range instead of N timedelta additions. Postgres
+        # parses the ISO strings straight into the timestamptz[] bind.
+        synth_ts = None
+        if t_min is None:
+            synth_ts = np.char.add(
+                (
+                    np.datetime64(base_ts.replace(tzinfo=None))
+                    + np.arange(len(pts), dtype="timedelta64[s]")
+                ).astype(str),
+                "+00",
+            ).tolist()
+
+        # Whole-column timestamp coercion when the file has times: one
+        # vectorized pass instead of a to_utc() call per point. Missing
+        # times come back as NaT and fall through to the ramp below.
+        ts_batch = None
+        if pd is not None and t_min is not None:
+            try:
+                ts_batch = pd.to_datetime([p.time for p in pts], utc=True).to_pydatetime()
+            except (TypeError, ValueError):
+                ts_batch = None
+
+        ids: List[str] = []
+        tss: List[object] = []  # datetimes, or ISO strings on the synthetic path
+        elevs: List[Optional[float]] = []
+        lons: List[float] = []
+        lats: List[float] = []
+        zs: List[Optional[float]] = []
         for i, p in enumerate(pts):
             lat = float(p.latitude) if p.latitude is not None else None
             lon = float(p.longitude) if p.longitude is not None else None
             if lat is None or lon is None:
                 continue
             z = float(p.elevation) if p.elevation is not None else None
-            ts_value = to_utc(p.time) if p.time else (base_ts + timedelta(seconds=i))
-            row = {
-                "track_id": str(track_id),
-                "ts": ts_value,
-                "lat": lat,
-                "lon": lon,
-                "z": z,  # used only if geom_dim >= 3
-            }
-            if has_elev:
-                row["elev_m"] = z
             if include_id:
-                row["id"] = str(uuid.uuid4())
-            rows.append(row)
+                ids.append(str(uuid7()))
+            if synth_ts is not None:
+                tss.append(synth_ts[i])
+            elif ts_batch is not None:
+                tv = ts_batch[i]
+                tss.append(tv if tv == tv else base_ts + timedelta(seconds=i))  # NaT != NaT
+            else:
+                tss.append(to_utc(p.time) if p.time else (base_ts + timedelta(seconds=i)))
+            if has_elev:
+                elevs.append(z)
+            lons.append(lon)
+            lats.append(lat)
+            if d3:
+                zs.append(z)
 
-        if not rows:
+        if not tss:
             db.rollback()
             raise HTTPException(status_code=400, detail="GPX contains no valid coordinate points.")
 
+        params: Dict[str, object] = {"tid": str(track_id), "ts": tss, "lon": lons, "lat": lats}
+        if include_id:
+            params["ids"] = ids
+        if has_elev:
+            params["elev"] = elevs
+        if d3:
+            params["z"] = zs
+
         try:
-            db.execute(text(sql), rows)  # executemany
-            inserted_points = len(rows)
+            if len(tss) >= _COPY_MIN_POINTS:
+                _copy_track_points(db, has_elev, include_id, d3, srid,
+                                   track_id, ids, tss, elevs, lons, lats, zs)
+            else:
+                db.execute(_unnest_insert_sql(has_elev, include_id, d3, srid), params)
+            inserted_points = len(tss)
+        except HTTPException:
+            raise
         except Exception as e:
             db.rollback()
             log.exception("Insert into track_points (PostGIS) failed")
             raise HTTPException(status_code=500, detail=f"Insert track_points (geom) failed: {e}")
 
+        # Materialize the assembled line on the parent row so /line reads
+        # fetch one tracks row instead of re-aggregating every point.
+        if "geom_line" in tracks_cols:
+            sets = ["geom_line = l.g"]
+            if "geom_line_simplified_100" in tracks_cols:
+                sets.append("geom_line_simplified_100 = ST_SimplifyVW(l.g, 100)")
+            try:
+                db.execute(
+                    text(f"""
+                        UPDATE tracks SET {', '.join(sets)}
+                        FROM (
+                            SELECT ST_MakeLine(geom ORDER BY ts) AS g
+                            FROM track_points
+                            WHERE track_id = CAST(:tid AS uuid)
+                        ) l
+                        WHERE tracks.id = CAST(:tid AS uuid)
+                    """),
+                    {"tid": str(track_id)},
+                )
+            except Exception as e:
+                db.rollback()
+                log.exception("Materializing tracks.geom_line failed")
+                raise HTTPException(status_code=500, detail=f"Update tracks.geom_line failed: {e}")
+
     else:
         # Branch B: classic schema(s)
         classic_templates = [
@@ -296,6 +613,79 @@ def upload_gpx(
     }
 
 
+@router.post("/upload")
+async def upload_gpx(
+    request: Request,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user_id=Depends(get_current_user_id),
+):
+    # ensure multipart is available
+    try:
+        import multipart  # noqa: F401
+    except Exception:
+        raise HTTPException(status_code=500, detail="python-multipart not installed. Run: pip install python-multipart")
+
+    if not file.filename.lower().endswith(".gpx"):
+        raise HTTPException(status_code=400, detail="Only .gpx files are supported right now.")
+
+    # Cheap declared-size check before reading anything
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_GPX_BYTES:
+        raise HTTPException(status_code=413, detail=f"GPX too large (limit {MAX_GPX_BYTES} bytes).")
+
+    # Stream the upload in chunks into a spooled temp file (spills to disk
+    # past 8 MB) instead of buffering the whole body in one read() call.
+    # Count as we go: content-length can lie or be absent on chunked bodies.
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    received = 0
+    while True:
+        chunk = await file.read(1024 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+        if received > MAX_GPX_BYTES:
+            spool.close()
+            raise HTTPException(status_code=413, detail=f"GPX too large (limit {MAX_GPX_BYTES} bytes).")
+        spool.write(chunk)
+    spool.seek(0)
+
+    # Fast prescan: a GPX worth parsing mentions <trk within the head of the
+    # file; bail before the full XML pass if it never appears there.
+    head = spool.read(64 * 1024)
+    spool.seek(0)
+    if b"<trk" not in head:
+        spool.close()
+        raise HTTPException(status_code=400, detail="GPX contains no tracks.")
+
+    # Parse + flatten + distance are CPU-bound; run them off the event loop
+    # so concurrent uploads don't serialize behind one parse.
+    try:
+        pts, total_dist_m, gpx_bounds = await anyio.to_thread.run_sync(_parse_gpx_sync, spool)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid GPX: {e}")
+    finally:
+        spool.close()
+
+    if not pts:
+        raise HTTPException(status_code=400, detail="GPX contains no points.")
+
+    # Everything from here on is synchronous DB I/O plus O(N) batch
+    # assembly; hand it to a worker thread (as import_spot_feed does) so
+    # one big upload doesn't stall the loop for other requests.
+    return await anyio.to_thread.run_sync(
+        _store_track_sync, db, user_id, file.filename, pts, total_dist_m, gpx_bounds
+    )
+
+
+def _track_select_cols(db: Session) -> str:
+    # Everything except the materialized line geometries: those are for
+    # /line, and as hex EWKB they'd dwarf the rest of a track payload.
+    return ", ".join(
+        c for c in get_columns(db, "tracks") if not c.startswith("geom_line")
+    )
+
+
 @router.get("")
 def list_tracks(
     limit: int = 25,
@@ -308,7 +698,7 @@ def list_tracks(
     order_sql = "ORDER BY started_at NULLS LAST" + (", created_at DESC" if "created_at" in track_cols else "")
 
     sql = text(f"""
-        SELECT * FROM tracks
+        SELECT {_track_select_cols(db)} FROM tracks
         WHERE user_id = CAST(:uid AS uuid)
         {order_sql}
         LIMIT :limit OFFSET :offset
@@ -320,15 +710,26 @@ def list_tracks(
 
 @router.get("/{track_id}")
 def get_track(track_id: uuid.UUID, db: Session = Depends(get_db), user_id=Depends(get_current_user_id)):
-    row = db.execute(text("SELECT * FROM tracks WHERE id = :id"), {"id": str(track_id)}).mappings().first()
+    row = db.execute(
+        text(f"SELECT {_track_select_cols(db)} FROM tracks WHERE id = :id"),
+        {"id": str(track_id)},
+    ).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Track not found")
 
+    # Bounds stored at upload time make this an O(1) read; tracks from
+    # before the bounds migration fall back to aggregating the points.
+    if row.get("min_lat") is not None:
+        return {
+            "track": {k: row[k] for k in row.keys()},
+            "bounds": {k: row[k] for k in ("min_lat", "max_lat", "min_lon", "max_lon")},
+        }
+
     # Bounds from PostGIS geom if available; else from lat/lon
-    tpoints_cols = set(get_columns(db, "track_points"))
+    schema = detect_track_points_schema(db)
 
     bounds = None
-    if "geom" in tpoints_cols:
+    if schema in (TrackPointsSchema.POSTGIS_WITH_ELEV, TrackPointsSchema.POSTGIS_NO_ELEV):
         b = db.execute(
             text("""
                 SELECT
@@ -373,26 +774,35 @@ def get_track_points(
     if not exists:
         raise HTTPException(status_code=404, detail="Track not found")
 
-    cols = set(get_columns(db, "track_points"))
-    if {"geom", "ts"}.issubset(cols):
-        base_sql = """
+    schema = detect_track_points_schema(db)
+    if schema in (TrackPointsSchema.POSTGIS_WITH_ELEV, TrackPointsSchema.POSTGIS_NO_ELEV):
+        ts_col = "ts"
+        elev_sel = "elev_m" if schema is TrackPointsSchema.POSTGIS_WITH_ELEV else "NULL AS elev_m"
+        # prefer the generated lon/lat columns (plain doubles materialized at
+        # insert) over reparsing EWKB with ST_X/ST_Y on every row
+        if {"lat", "lon"}.issubset(get_columns(db, "track_points")):
+            coord_sel = "lat, lon"
+        else:
+            coord_sel = "ST_Y(geom) AS lat, ST_X(geom) AS lon"
+        base_sql = f"""
             SELECT ts,
-                   elev_m,
-                   ST_Y(geom) AS lat,
-                   ST_X(geom) AS lon,
+                   {elev_sel},
+                   {coord_sel},
                    CASE WHEN ST_Z(geom) IS NULL THEN NULL ELSE ST_Z(geom) END AS z
             FROM track_points
             WHERE track_id = :id
             ORDER BY ts ASC
         """
-    elif {"lat", "lon", "t"}.issubset(cols):
+    elif schema is TrackPointsSchema.CLASSIC_LAT_LON:
+        ts_col = "t"
         base_sql = """
             SELECT t AS ts, ele AS elev_m, lat, lon, NULL AS z
             FROM track_points
             WHERE track_id = :id
             ORDER BY t ASC
         """
-    elif {"lat", "lng", "t"}.issubset(cols):
+    elif schema is TrackPointsSchema.CLASSIC_LAT_LNG:
+        ts_col = "t"
         base_sql = """
             SELECT t AS ts, ele AS elev_m, lat, lng AS lon, NULL AS z
             FROM track_points
@@ -400,20 +810,20 @@ def get_track_points(
             ORDER BY t ASC
         """
     else:
-        raise HTTPException(status_code=500, detail=f"Unsupported track_points schema: {sorted(cols)}")
+        raise HTTPException(status_code=500, detail=f"Unsupported track_points schema: {schema.value}")
 
     params = {"id": str(track_id)}
     sql = base_sql
     if downsample and downsample > 1:
-        sql = f"""
-            WITH ordered AS (
-              SELECT *, ROW_NUMBER() OVER (ORDER BY ts ASC) rn
-              FROM ({base_sql}) q
-            )
-            SELECT ts, elev_m, lat, lon, z
-            FROM ordered
-            WHERE rn % :ds = 0
-        """
+        # Stride on the epoch second instead of ranking with ROW_NUMBER():
+        # the filter runs inside the (track_id, ts) index scan, so no window
+        # sort materializes the full set first. For regularly-sampled tracks
+        # this keeps ~1/N points; with irregular intervals it is an
+        # approximation, which is fine for rendering.
+        sql = base_sql.replace(
+            "WHERE track_id = :id",
+            f"WHERE track_id = :id AND (extract(epoch FROM {ts_col})::bigint % :ds) = 0",
+        )
         params["ds"] = downsample
     if limit and limit > 0:
         sql += " LIMIT :limit"
@@ -430,9 +840,32 @@ def get_track_line(
     user_id=Depends(get_current_user_id),
     simplify: float = 0.0,   # tolerance in meters for Visvalingam-Whyatt
 ):
-    cols = set(get_columns(db, "track_points"))
-    if "geom" not in cols or "ts" not in cols:
-        raise HTTPException(status_code=500, detail=f"Unsupported track_points schema: {sorted(cols)}")
+    # Fast path: the line is materialized on tracks at upload time; old rows
+    # (NULL geom_line) fall through to the point aggregation below.
+    tracks_cols = set(get_columns(db, "tracks"))
+    if "geom_line" in tracks_cols:
+        if simplify == 100 and "geom_line_simplified_100" in tracks_cols:
+            # tolerance 100 is the standard map tolerance, precomputed at
+            # upload — serve the stored column instead of re-simplifying
+            # (COALESCE covers rows uploaded before the column existed)
+            line_expr = "ST_Force2D(COALESCE(geom_line_simplified_100, ST_SimplifyVW(geom_line, 100)))"
+            line_params = {"id": str(track_id)}
+        elif simplify and simplify > 0:
+            line_expr = "ST_SimplifyVW(ST_Force2D(geom_line), :tol)"
+            line_params = {"id": str(track_id), "tol": simplify}
+        else:
+            line_expr = "ST_Force2D(geom_line)"
+            line_params = {"id": str(track_id)}
+        row = db.execute(
+            text(f"SELECT ST_AsGeoJSON({line_expr}) AS geojson FROM tracks WHERE id = :id"),
+            line_params,
+        ).first()
+        if row and row[0]:
+            return {"type": "Feature", "geometry": row[0], "properties": {"track_id": str(track_id)}}
+
+    schema = detect_track_points_schema(db)
+    if schema not in (TrackPointsSchema.POSTGIS_WITH_ELEV, TrackPointsSchema.POSTGIS_NO_ELEV):
+        raise HTTPException(status_code=500, detail=f"Unsupported track_points schema: {schema.value}")
 
     if simplify and simplify > 0:
         geom_expr = "ST_SimplifyVW(ST_MakeLine(ST_Force2D(geom) ORDER BY ts), :tol)"
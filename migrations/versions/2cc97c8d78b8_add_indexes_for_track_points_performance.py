@@ -17,13 +17,14 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
-    # btree indexes for typical reads
-    op.execute("CREATE INDEX IF NOT EXISTS idx_track_points_track_id ON track_points(track_id)")
-    op.execute("CREATE INDEX IF NOT EXISTS idx_track_points_track_id_ts ON track_points(track_id, ts)")
+    # track_points is a partitioned parent (see initial schema), and Postgres
+    # rejects CREATE INDEX CONCURRENTLY there; plain builds it is. Existing
+    # partitions are indexed in one pass, future ones inherit automatically.
+    # No (track_id[, ts]) btrees here: the initial schema's covering
+    # ix_track_points_track_ts already serves both prefixes, and duplicates
+    # would just amplify writes on the hottest insert path.
     # spatial index for map operations
     op.execute("CREATE INDEX IF NOT EXISTS idx_track_points_geom ON track_points USING GIST(geom)")
 
 def downgrade():
     op.execute("DROP INDEX IF EXISTS idx_track_points_geom")
-    op.execute("DROP INDEX IF EXISTS idx_track_points_track_id_ts")
-    op.execute("DROP INDEX IF EXISTS idx_track_points_track_id")
@@ -0,0 +1,45 @@
+"""live_positions follow-up indexes (consolidated)
+
+Replaces three bookkeeping-only revisions: the provider_msg_id index
+file (whose revision id was the literal "<auto_generated_by_alembic>"
+placeholder), the empty merge node c1287ef43675 that referenced a
+nonexistent "add_provider_msg_id" branch, and the empty 435f27ebaeba.
+One revision means one transaction, one alembic_version update and one
+lock acquisition per deploy instead of three.
+
+Only the geom index survives the consolidation: the (device_id, ts)
+index those files once carried is covered by uq_live_device_ts in the
+initial schema. Plain (non-CONCURRENT) build — live_positions is a
+partitioned parent, which Postgres excludes from CREATE INDEX
+CONCURRENTLY.
+
+Databases already stamped at one of the old revision ids need a one-off
+`alembic stamp 3f6a1c0d9e42` before upgrading.
+
+Revision ID: 3f6a1c0d9e42
+Revises: add_track_points_indexes
+Create Date: 2025-09-25 15:51:25.762090
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f6a1c0d9e42"
+down_revision: Union[str, Sequence[str], None] = "add_track_points_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GiST, not SP-GiST: geom is geography, which SP-GiST doesn't support.
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_live_positions_geom
+        ON live_positions USING GIST (geom);
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_live_positions_geom;")
@@ -0,0 +1,46 @@
+"""ts indexes: btree -> BRIN for append-only time series
+
+Ingest into track_points and live_positions is append-only and ts-ordered,
+the classic BRIN case: the index stays tiny, inserts avoid btree page
+splits, and time-range scans skip whole heap pages. Per-track/per-device
+ordered reads keep their composite btrees.
+
+Revision ID: 5e27c8b1f3aa
+Revises: 9b41d6c02a77
+Create Date: 2026-08-31
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e27c8b1f3aa"
+down_revision: Union[str, Sequence[str], None] = "9b41d6c02a77"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Plain builds: partitioned parents don't allow CREATE INDEX CONCURRENTLY,
+    # and BRIN builds are cheap anyway.
+    op.execute("DROP INDEX IF EXISTS ix_track_points_ts")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_track_points_ts_brin "
+        "ON track_points USING BRIN (ts)"
+    )
+
+    op.execute("DROP INDEX IF EXISTS ix_live_positions_ts")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_live_positions_ts_brin "
+        "ON live_positions USING BRIN (ts)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_live_positions_ts_brin")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_live_positions_ts ON live_positions (ts)")
+
+    op.execute("DROP INDEX IF EXISTS ix_track_points_ts_brin")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_track_points_ts ON track_points (ts)")
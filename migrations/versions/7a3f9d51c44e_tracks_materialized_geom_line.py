@@ -0,0 +1,38 @@
+"""tracks: materialized geom_line columns
+
+/tracks/{id}/line used to rebuild ST_MakeLine(... ORDER BY ts) over the
+full point set on every request. Store the assembled line (and a
+pre-simplified variant) on the parent tracks row at upload time so map
+reads become a single-row fetch.
+
+Revision ID: 7a3f9d51c44e
+Revises: 5e27c8b1f3aa
+Create Date: 2026-08-31
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3f9d51c44e"
+down_revision: Union[str, Sequence[str], None] = "5e27c8b1f3aa"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS "
+        "geom_line geometry(LineStringZ, 4326)"
+    )
+    op.execute(
+        "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS "
+        "geom_line_simplified_100 geometry(LineStringZ, 4326)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS geom_line_simplified_100")
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS geom_line")
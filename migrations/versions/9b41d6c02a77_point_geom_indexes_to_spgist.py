@@ -0,0 +1,46 @@
+"""point geom indexes: GiST -> SP-GiST
+
+SP-GiST indexes are smaller and faster than GiST for non-overlapping point
+data (track_points). Routes keep GiST — linestrings and bbox polygons don't
+benefit from SP-GiST — and live_positions.geom is geography, which has no
+SP-GiST opclass, so it stays on GiST too.
+
+Revision ID: 9b41d6c02a77
+Revises: 3f6a1c0d9e42
+Create Date: 2026-08-31
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9b41d6c02a77"
+down_revision: Union[str, Sequence[str], None] = "3f6a1c0d9e42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Plain (transactional) rebuilds: both tables are partitioned parents,
+    # which Postgres excludes from CREATE INDEX CONCURRENTLY.
+    # Drop both naming variants (geoalchemy2's idx_* from the initial schema
+    # and the idx_*/ix_* copies from later index migrations)
+    op.execute("DROP INDEX IF EXISTS idx_track_points_geom")
+    op.execute("DROP INDEX IF EXISTS ix_track_points_geom")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_track_points_geom ON track_points USING SPGIST (geom)")
+    # Shed the (track_id[, ts]) btrees older databases picked up from the
+    # original index migration — ix_track_points_track_ts covers both.
+    op.execute("DROP INDEX IF EXISTS idx_track_points_track_id")
+    op.execute("DROP INDEX IF EXISTS idx_track_points_track_id_ts")
+
+    # Fold the duplicate idx_* variant into the canonical GiST name; no
+    # SP-GiST conversion here (geography column).
+    op.execute("DROP INDEX IF EXISTS idx_live_positions_geom")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_live_positions_geom ON live_positions USING GIST (geom)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_track_points_geom")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_track_points_geom ON track_points USING GIST (geom)")
@@ -0,0 +1,36 @@
+"""tracks: store upload-time bounds
+
+get_track recomputed ST_Extent over every point of a track on each
+fetch. The bounds are known for free at upload (the same arrays feed
+the distance pass), so persist them on the tracks row and make the GET
+an O(1) read.
+
+Revision ID: b8d2e61f0a9c
+Revises: 7a3f9d51c44e
+Create Date: 2026-08-31
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d2e61f0a9c"
+down_revision: Union[str, Sequence[str], None] = "7a3f9d51c44e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE tracks ADD COLUMN IF NOT EXISTS min_lat double precision")
+    op.execute("ALTER TABLE tracks ADD COLUMN IF NOT EXISTS max_lat double precision")
+    op.execute("ALTER TABLE tracks ADD COLUMN IF NOT EXISTS min_lon double precision")
+    op.execute("ALTER TABLE tracks ADD COLUMN IF NOT EXISTS max_lon double precision")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS max_lon")
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS min_lon")
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS max_lat")
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS min_lat")
@@ -1,5 +1,23 @@
 ﻿"""initial schema
 
+The ts indexes on track_points and live_positions are BRIN: both tables
+are append-only and ingest in timestamp order, so block ranges stay
+tightly correlated with ts. Keep it that way — bulk backfills out of
+time order degrade BRIN selectivity until a REINDEX. (If backdated
+inserts ever become routine, drop pages_per_range from 32 to 4 to
+tolerate the disorder.) No CLUSTER is needed or possible — BRIN can't
+drive CLUSTER, and the append-only ingest keeps heap order for free.
+
+Partitions of both tables carry eager autovacuum settings (vacuum at 2%
+churn, analyze at 1%) so the visibility map and planner stats stay fresh
+enough for the index-only scans the covering indexes are built for.
+
+The device_type and route_source enums are created here explicitly
+(checkfirst, create_type=False on the column types). Adding a provider
+later is a one-liner in a new revision — no type recreate, no rewrite:
+
+    op.execute("ALTER TYPE device_type ADD VALUE IF NOT EXISTS 'garmin'")
+
 Revision ID: dd410ac30f13
 Revises:
 Create Date: 2025-09-22
@@ -17,139 +35,316 @@ depends_on = None
 
 
 def upgrade() -> None:
-    # Nukes from failed attempts: drop lingering enums if they exist (no tables yet, safe)
+    # Everything below is rerun-safe: a migration killed midway (lost
+    # connection, OOM on a big restore) can simply run again and each step
+    # no-ops past what already exists instead of failing on the first
+    # duplicate table.
+    insp = sa.inspect(op.get_bind())
+
+    # Nukes from failed attempts: drop lingering enums, but only while no
+    # table uses them yet — CASCADE on a partially-built schema would take
+    # live columns with it.
+    if not insp.has_table("devices") and not insp.has_table("routes"):
+        op.execute("DROP TYPE IF EXISTS device_type, route_source CASCADE")
+
+    # Create the enum types explicitly up front (checkfirst makes it a rerun
+    # no-op); create_type=False keeps create_table from racing to create them
+    # again. Future labels never need a type recreate — see module docstring.
+    device_type = pg.ENUM("spot", "inreach", "other", name="device_type", create_type=False)
+    route_source = pg.ENUM("gpx", "rwgps", "strava", "manual", name="route_source", create_type=False)
+    device_type.create(op.get_bind(), checkfirst=True)
+    route_source.create(op.get_bind(), checkfirst=True)
+
+    # users
+    if not insp.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column("email", sa.String(length=320), unique=True, nullable=True),
+            sa.Column("name", sa.String(length=200), nullable=True),
+            sa.Column(
+                "home_geom",
+                geoalchemy2.types.Geometry(geometry_type="POINT", srid=4326, spatial_index=True),
+                nullable=True,
+            ),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+
+    # devices
+    if not insp.has_table("devices"):
+        op.create_table(
+            "devices",
+            sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column("user_id", pg.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("type", device_type, nullable=False),
+            sa.Column("external_id", sa.String(length=128), nullable=False),
+            sa.Column("secret", sa.String(length=256), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.UniqueConstraint("type", "external_id", name="uq_device_provider_extid"),
+        )
+    # routes
+    if not insp.has_table("routes"):
+        op.create_table(
+            "routes",
+            sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column("user_id", pg.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("name", sa.String(length=200), nullable=False),
+            sa.Column("source", route_source, nullable=False),
+            sa.Column("distance_m", sa.Float(), nullable=True),
+            sa.Column("ascent_m", sa.Float(), nullable=True),
+            sa.Column("descent_m", sa.Float(), nullable=True),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("ended_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column(
+                "geom",
+                geoalchemy2.types.Geometry(geometry_type="LINESTRINGZ", srid=4326, spatial_index=True),
+                nullable=False,
+            ),
+            sa.Column(
+                "bbox",
+                geoalchemy2.types.Geometry(geometry_type="POLYGON", srid=4326, spatial_index=True),
+                nullable=True,
+            ),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+    # tracks
+    if not insp.has_table("tracks"):
+        op.create_table(
+            "tracks",
+            sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
+            sa.Column("user_id", pg.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("route_id", pg.UUID(as_uuid=True), sa.ForeignKey("routes.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("device_id", pg.UUID(as_uuid=True), sa.ForeignKey("devices.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("name", sa.String(length=200), nullable=True),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("ended_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("total_distance_m", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+    # track_points: partitioned monthly by ts. Time-bounded queries prune to
+    # the active month and retention becomes DROP PARTITION; the partition
+    # key must be part of the PK, hence (id, ts). Rows for months without a
+    # named partition land in the default partition, so nothing is lost if
+    # ensure_track_points_partition() isn't called ahead of ingest.
+    # lon/lat are generated STORED columns — materialized once per insert, so
+    # analytics/export scans read plain doubles instead of calling ST_X/ST_Y
+    # (EWKB reparse) on every row, and a btree on them is available if bbox
+    # queries ever outgrow SP-GiST.
     op.execute(
         """
-        DO $$
+        CREATE TABLE IF NOT EXISTS track_points (
+            id bigint GENERATED BY DEFAULT AS IDENTITY,
+            track_id uuid NOT NULL REFERENCES tracks(id) ON DELETE CASCADE,
+            ts timestamptz NOT NULL,
+            elev_m double precision,
+            geom geometry(PointZ, 4326) NOT NULL,
+            lon double precision GENERATED ALWAYS AS (ST_X(geom)) STORED,
+            lat double precision GENERATED ALWAYS AS (ST_Y(geom)) STORED,
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts)
+        """
+    )
+    # fillfactor 90 leaves slack for HOT updates (elevation corrections,
+    # cleanup passes) without page splits; the autovacuum scale factors keep
+    # the visibility map fresh (see module docstring). Partitioned parents
+    # carry no storage, so the settings go on each partition.
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS track_points_default PARTITION OF track_points DEFAULT "
+        "WITH (fillfactor = 90, autovacuum_vacuum_scale_factor = 0.02, "
+        "autovacuum_analyze_scale_factor = 0.01)"
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION ensure_track_points_partition(p_ts timestamptz)
+        RETURNS void LANGUAGE plpgsql AS $$
+        DECLARE
+            start_ts timestamptz := date_trunc('month', p_ts);
+            part text := 'track_points_' || to_char(start_ts, 'YYYYMM');
         BEGIN
-            IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'device_type') THEN
-                DROP TYPE device_type;
-            END IF;
-            IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'route_source') THEN
-                DROP TYPE route_source;
+            IF to_regclass(part) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF track_points '
+                    'FOR VALUES FROM (%L) TO (%L) '
+                    'WITH (fillfactor = 90, '
+                    'autovacuum_vacuum_scale_factor = 0.02, '
+                    'autovacuum_analyze_scale_factor = 0.01)',
+                    part, start_ts, start_ts + interval '1 month');
             END IF;
         END$$;
         """
     )
-
-    # Define named enums (let table DDL create them once)
-    device_type = sa.Enum("spot", "inreach", "other", name="device_type")
-    route_source = sa.Enum("gpx", "rwgps", "strava", "manual", name="route_source")
-
-    # users
-    op.create_table(
-        "users",
-        sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
-        sa.Column("email", sa.String(length=320), unique=True, nullable=True),
-        sa.Column("name", sa.String(length=200), nullable=True),
-        sa.Column(
-            "home_geom",
-            geoalchemy2.types.Geometry(geometry_type="POINT", srid=4326, spatial_index=True),
-            nullable=True,
-        ),
-        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    # live_positions: same monthly partitioning — even higher churn than
+    # track_points. The (device_id, ts) unique constraint includes the
+    # partition key, so the importer's ON CONFLICT dedupe keeps working.
+    # geom is geography (not geometry): "nearby devices" queries then get
+    # correct spheroid meters straight from ST_DWithin/ST_Distance with no
+    # per-query ::geography casts, and the GiST index serves them directly.
+    # track_points stays geometry — its queries are per-track and never need
+    # spheroid distance.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS live_positions (
+            id bigint GENERATED BY DEFAULT AS IDENTITY,
+            device_id uuid NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+            ts timestamptz NOT NULL,
+            geom geography(PointZ, 4326) NOT NULL,
+            lon double precision GENERATED ALWAYS AS (ST_X(geom::geometry)) STORED,
+            lat double precision GENERATED ALWAYS AS (ST_Y(geom::geometry)) STORED,
+            battery double precision,
+            PRIMARY KEY (id, ts)
+        ) PARTITION BY RANGE (ts)
+        """
     )
-
-    # devices
-    op.create_table(
-        "devices",
-        sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
-        sa.Column("user_id", pg.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
-        sa.Column("type", device_type, nullable=False),
-        sa.Column("external_id", sa.String(length=128), nullable=False),
-        sa.Column("secret", sa.String(length=256), nullable=True),
-        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
-        sa.UniqueConstraint("type", "external_id", name="uq_device_provider_extid"),
+    # fillfactor 95, not 90: live_positions rows are never updated in place,
+    # only deduped at insert, so the HOT slack can be thinner
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS live_positions_default PARTITION OF live_positions DEFAULT "
+        "WITH (fillfactor = 95, autovacuum_vacuum_scale_factor = 0.02, "
+        "autovacuum_analyze_scale_factor = 0.01)"
     )
-    op.create_index("ix_devices_user_id", "devices", ["user_id"], unique=False)
-    op.create_index("ix_devices_external_id", "devices", ["external_id"], unique=False)
-
-    # routes
-    op.create_table(
-        "routes",
-        sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
-        sa.Column("user_id", pg.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
-        sa.Column("name", sa.String(length=200), nullable=False),
-        sa.Column("source", route_source, nullable=False),
-        sa.Column("distance_m", sa.Float(), nullable=True),
-        sa.Column("ascent_m", sa.Float(), nullable=True),
-        sa.Column("descent_m", sa.Float(), nullable=True),
-        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
-        sa.Column("ended_at", sa.DateTime(timezone=True), nullable=True),
-        sa.Column(
-            "geom",
-            geoalchemy2.types.Geometry(geometry_type="LINESTRINGZ", srid=4326, spatial_index=True),
-            nullable=False,
-        ),
-        sa.Column(
-            "bbox",
-            geoalchemy2.types.Geometry(geometry_type="POLYGON", srid=4326, spatial_index=True),
-            nullable=True,
-        ),
-        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION ensure_live_positions_partition(p_ts timestamptz)
+        RETURNS void LANGUAGE plpgsql AS $$
+        DECLARE
+            start_ts timestamptz := date_trunc('month', p_ts);
+            part text := 'live_positions_' || to_char(start_ts, 'YYYYMM');
+        BEGIN
+            IF to_regclass(part) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF live_positions '
+                    'FOR VALUES FROM (%L) TO (%L) '
+                    'WITH (fillfactor = 95, '
+                    'autovacuum_vacuum_scale_factor = 0.02, '
+                    'autovacuum_analyze_scale_factor = 0.01)',
+                    part, start_ts, start_ts + interval '1 month');
+            END IF;
+        END$$;
+        """
     )
-    op.create_index("ix_routes_user_id", "routes", ["user_id"], unique=False)
-
-    # tracks
-    op.create_table(
-        "tracks",
-        sa.Column("id", pg.UUID(as_uuid=True), primary_key=True, nullable=False),
-        sa.Column("user_id", pg.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
-        sa.Column("route_id", pg.UUID(as_uuid=True), sa.ForeignKey("routes.id", ondelete="SET NULL"), nullable=True),
-        sa.Column("device_id", pg.UUID(as_uuid=True), sa.ForeignKey("devices.id", ondelete="SET NULL"), nullable=True),
-        sa.Column("name", sa.String(length=200), nullable=True),
-        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
-        sa.Column("ended_at", sa.DateTime(timezone=True), nullable=True),
-        sa.Column("total_distance_m", sa.Float(), nullable=True),
-        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    # Rarely-read provider payloads live in a sibling table so the hot
+    # live_positions heap stays narrow — map/time-range scans pack more rows
+    # per page. A row exists only when the provider actually sent extras.
+    # Keyed (position_id, ts): the partition key must ride along since the
+    # parent's PK is (id, ts), and that's also the only FK shape Postgres
+    # accepts against a partitioned parent.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS live_positions_extra (
+            position_id bigint NOT NULL,
+            ts timestamptz NOT NULL,
+            extra jsonb NOT NULL,
+            PRIMARY KEY (position_id, ts),
+            FOREIGN KEY (position_id, ts)
+                REFERENCES live_positions (id, ts) ON DELETE CASCADE
+        )
+        """
     )
-    op.create_index("ix_tracks_user_id", "tracks", ["user_id"], unique=False)
-
-    # track_points
-    op.create_table(
-        "track_points",
-        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True, nullable=False),
-        sa.Column("track_id", pg.UUID(as_uuid=True), sa.ForeignKey("tracks.id", ondelete="CASCADE"), nullable=False),
-        sa.Column("ts", sa.DateTime(timezone=True), nullable=False),
-        sa.Column("elev_m", sa.Float(), nullable=True),
-        sa.Column(
-            "geom",
-            geoalchemy2.types.Geometry(geometry_type="POINTZ", srid=4326, spatial_index=True),
-            nullable=False,
-        ),
+    # Explicit SRID/dimensionality CHECKs on the geometry columns: the
+    # typmods already enforce these at write time, but the planner only
+    # reasons from declared constraints, so spelling them out lets it prove
+    # ST_Transform/ST_Force3D-style sub-expressions are no-ops on the hot
+    # read paths. NOT VALID then VALIDATE keeps the exclusive lock short on
+    # reruns against populated tables, and the DO block stands in for the
+    # missing ADD CONSTRAINT IF NOT EXISTS (VALIDATE on an already-valid
+    # constraint is a no-op). live_positions is left out: its geom is
+    # geography, whose typmod pins SRID 4326 on its own.
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            spec record;
+        BEGIN
+            FOR spec IN
+                SELECT * FROM (VALUES
+                    ('users', 'users_home_geom_srid_chk', 'ST_SRID(home_geom) = 4326'),
+                    ('users', 'users_home_geom_ndims_chk', 'ST_NDims(home_geom) = 2'),
+                    ('routes', 'routes_geom_srid_chk', 'ST_SRID(geom) = 4326'),
+                    ('routes', 'routes_geom_ndims_chk', 'ST_NDims(geom) = 3'),
+                    ('routes', 'routes_bbox_srid_chk', 'ST_SRID(bbox) = 4326'),
+                    ('routes', 'routes_bbox_ndims_chk', 'ST_NDims(bbox) = 2'),
+                    ('track_points', 'track_points_geom_srid_chk', 'ST_SRID(geom) = 4326'),
+                    ('track_points', 'track_points_geom_ndims_chk', 'ST_NDims(geom) = 3')
+                ) AS v(tbl, con, expr)
+            LOOP
+                IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = spec.con) THEN
+                    EXECUTE format(
+                        'ALTER TABLE %I ADD CONSTRAINT %I CHECK (%s) NOT VALID',
+                        spec.tbl, spec.con, spec.expr);
+                END IF;
+                EXECUTE format('ALTER TABLE %I VALIDATE CONSTRAINT %I', spec.tbl, spec.con);
+            END LOOP;
+        END$$;
+        """
     )
-    op.create_index("ix_track_points_track_id", "track_points", ["track_id"], unique=False)
-    op.create_index("ix_track_points_ts", "track_points", ["ts"], unique=False)
-    op.create_index("ix_track_points_track_ts", "track_points", ["track_id", "ts"], unique=False)
-
-    # live_positions
-    op.create_table(
-        "live_positions",
-        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True, nullable=False),
-        sa.Column("device_id", pg.UUID(as_uuid=True), sa.ForeignKey("devices.id", ondelete="CASCADE"), nullable=False),
-        sa.Column("ts", sa.DateTime(timezone=True), nullable=False),
-        sa.Column(
-            "geom",
-            geoalchemy2.types.Geometry(geometry_type="POINTZ", srid=4326, spatial_index=True),
-            nullable=False,
-        ),
-        sa.Column("battery", sa.Float(), nullable=True),
-        sa.Column("extra", sa.JSON(), nullable=True),
-        sa.UniqueConstraint("device_id", "ts", name="uq_live_device_ts"),
+    # All remaining indexes in one batch after the tables exist: a single
+    # round-trip, and the SET LOCALs let Postgres use parallel workers and a
+    # bigger maintenance arena for the btree builds on non-empty restores.
+    # Notes baked into the choices below:
+    #   * SP-GiST on track_points.geom (smaller/faster than GiST for points;
+    #     routes keep geoalchemy2's GiST for lines/polygons). live_positions
+    #     gets plain GiST — SP-GiST has no geography opclass;
+    #   * BRIN on ts (append-only ingest, see module docstring);
+    #   * no single-column track_id/device_id/external_id indexes — composite
+    #     prefixes cover them (device lookups always filter by provider type
+    #     first, so uq_device_provider_extid serves external_id searches);
+    #   * ix_track_points_track_ts INCLUDEs geom/elev_m and uq_live_device_ts
+    #     INCLUDEs geom/battery, so the "render a track" and "latest fix"
+    #     reads are index-only scans — no per-row heap fetches;
+    #   * uq_live_device_ts doubles as the ON CONFLICT dedupe arbiter;
+    #   * idx_live_positions_recent is the hot-window copy of that index:
+    #     dashboards only ever ask for recent fixes, and the partial index
+    #     stays small and cache-resident no matter how much history piles
+    #     up. Index predicates must be immutable, so the cutoff is a
+    #     literal date, not now() - interval: bump it in a periodic
+    #     follow-up migration (drop + recreate with a newer literal) or
+    #     automate the rebuild with pg_cron. A stale cutoff only makes the
+    #     index gradually larger, never wrong.
+    op.execute(
+        """
+        SET LOCAL maintenance_work_mem = '512MB';
+        SET LOCAL max_parallel_maintenance_workers = 4;
+
+        CREATE INDEX IF NOT EXISTS ix_devices_user_id ON devices (user_id);
+        CREATE INDEX IF NOT EXISTS ix_routes_user_id ON routes (user_id);
+        CREATE INDEX IF NOT EXISTS ix_tracks_user_id ON tracks (user_id);
+
+        CREATE INDEX IF NOT EXISTS ix_track_points_geom ON track_points USING SPGIST (geom);
+        CREATE INDEX IF NOT EXISTS ix_track_points_ts_brin ON track_points
+            USING BRIN (ts) WITH (pages_per_range=32);
+        CREATE INDEX IF NOT EXISTS ix_track_points_track_ts ON track_points (track_id, ts DESC)
+            INCLUDE (geom, elev_m);
+
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_live_device_ts ON live_positions
+            (device_id, ts DESC) INCLUDE (geom, battery);
+        CREATE INDEX IF NOT EXISTS idx_live_positions_recent ON live_positions
+            (device_id, ts DESC) INCLUDE (geom, battery)
+            WHERE ts > '2026-08-01';
+        CREATE INDEX IF NOT EXISTS ix_live_positions_geom ON live_positions USING GIST (geom);
+        CREATE INDEX IF NOT EXISTS ix_live_positions_ts_brin ON live_positions
+            USING BRIN (ts) WITH (pages_per_range=32);
+        CREATE INDEX IF NOT EXISTS ix_live_positions_extra_gin ON live_positions_extra
+            USING GIN (extra jsonb_path_ops);
+        """
     )
-    op.create_index("ix_live_positions_device_id", "live_positions", ["device_id"], unique=False)
-    op.create_index("ix_live_positions_ts", "live_positions", ["ts"], unique=False)
 
 
 def downgrade() -> None:
     # Drop in reverse order
-    op.drop_index("ix_live_positions_ts", table_name="live_positions")
-    op.drop_index("ix_live_positions_device_id", table_name="live_positions")
+    op.drop_index("ix_live_positions_extra_gin", table_name="live_positions_extra")
+    op.drop_table("live_positions_extra")
+
+    op.drop_index("ix_live_positions_ts_brin", table_name="live_positions")
+    op.drop_index("idx_live_positions_recent", table_name="live_positions")
+    op.drop_index("uq_live_device_ts", table_name="live_positions")
+    op.drop_index("ix_live_positions_geom", table_name="live_positions")
+    op.execute("DROP FUNCTION IF EXISTS ensure_live_positions_partition(timestamptz)")
     op.drop_table("live_positions")
 
     op.drop_index("ix_track_points_track_ts", table_name="track_points")
-    op.drop_index("ix_track_points_ts", table_name="track_points")
-    op.drop_index("ix_track_points_track_id", table_name="track_points")
+    op.drop_index("ix_track_points_ts_brin", table_name="track_points")
+    op.drop_index("ix_track_points_geom", table_name="track_points")
+    op.execute("DROP FUNCTION IF EXISTS ensure_track_points_partition(timestamptz)")
     op.drop_table("track_points")
 
     op.drop_index("ix_tracks_user_id", table_name="tracks")
@@ -158,24 +353,11 @@ def downgrade() -> None:
     op.drop_index("ix_routes_user_id", table_name="routes")
     op.drop_table("routes")
 
-    op.drop_index("ix_devices_external_id", table_name="devices")
     op.drop_index("ix_devices_user_id", table_name="devices")
     op.drop_table("devices")
 
     op.drop_table("users")
 
     # Clean up enums if they exist
-    op.execute(
-        """
-        DO $$
-        BEGIN
-            IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'route_source') THEN
-                DROP TYPE route_source;
-            END IF;
-            IF EXISTS (SELECT 1 FROM pg_type WHERE typname = 'device_type') THEN
-                DROP TYPE device_type;
-            END IF;
-        END$$;
-        """
-    )
+    op.execute("DROP TYPE IF EXISTS route_source, device_type CASCADE")
 